@@ -10,11 +10,19 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.database import Base
 from app.config import settings
 from app.models.transaction import Category, Transaction
+from app.models.archive import TransactionArchive, TransactionRollup
+from app.models.idempotency import IdempotencyKey
+from app.partitions import is_partition_table
 
 config = context.config
 
-# Переопределяем URL базы данных из настроек
-config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+# Переопределяем URL базы данных из настроек. Шарды мигрируются по одному:
+# alembic -x shard=1 upgrade head (номер шарда в SHARD_DATABASE_URLS)
+shard = context.get_x_argument(as_dictionary=True).get("shard")
+config.set_main_option(
+    "sqlalchemy.url",
+    settings.SHARD_DATABASE_URLS[int(shard)] if shard is not None else settings.DATABASE_URL
+)
 
 # Interpret the config file for Python logging
 if config.config_file_name is not None:
@@ -23,11 +31,19 @@ if config.config_file_name is not None:
 # Указываем метаданные для автогенерации миграций
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Партиции transactions создаются миграцией и app.partitions, а не моделями
+    table = name if type_ == "table" else getattr(getattr(object, "table", None), "name", None)
+    return not is_partition_table(table)
+
+
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -45,7 +61,10 @@ def run_migrations_online() -> None:
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite не умеет ALTER COLUMN: автогенерация пишет batch-операции
+            render_as_batch=connection.dialect.name == "sqlite"
         )
 
         with context.begin_transaction():
@@ -0,0 +1,58 @@
+"""Transactions archive
+
+Revision ID: 5b7d2c9e41a3
+Revises: 035e5b00e9cf
+Create Date: 2024-12-20 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7d2c9e41a3'
+down_revision: Union[str, None] = '035e5b00e9cf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('transactions_archive',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Date(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'period', name='uq_transactions_archive_user_period')
+    )
+    op.create_index(op.f('ix_transactions_archive_id'), 'transactions_archive', ['id'], unique=False)
+    op.create_index(op.f('ix_transactions_archive_user_id'), 'transactions_archive', ['user_id'], unique=False)
+    op.create_table('transaction_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Date(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'period', 'category_id', name='uq_transaction_rollups_user_period_category')
+    )
+    op.create_index(op.f('ix_transaction_rollups_id'), 'transaction_rollups', ['id'], unique=False)
+    op.create_index(op.f('ix_transaction_rollups_user_id'), 'transaction_rollups', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transaction_rollups_user_id'), table_name='transaction_rollups')
+    op.drop_index(op.f('ix_transaction_rollups_id'), table_name='transaction_rollups')
+    op.drop_table('transaction_rollups')
+    op.drop_index(op.f('ix_transactions_archive_user_id'), table_name='transactions_archive')
+    op.drop_index(op.f('ix_transactions_archive_id'), table_name='transactions_archive')
+    op.drop_table('transactions_archive')
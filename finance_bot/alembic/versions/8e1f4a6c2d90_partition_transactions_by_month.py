@@ -0,0 +1,120 @@
+"""Partition transactions by month
+
+Revision ID: 8e1f4a6c2d90
+Revises: 5b7d2c9e41a3
+Create Date: 2024-12-22 14:03:57.118240
+
+В PostgreSQL пересоздает transactions как таблицу, секционированную по
+диапазону created_at: месячные партиции для существующих данных и на
+три месяца вперед, а также партиция по умолчанию. Первичный ключ
+секционированной таблицы обязан включать ключ секционирования, поэтому
+он становится (id, created_at), а created_at - NOT NULL. Последовательность
+transactions_id_seq переносится на новую таблицу, id сохраняются.
+
+Для других СУБД только делает created_at обязательным.
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e1f4a6c2d90'
+down_revision: Union[str, None] = '5b7d2c9e41a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+COLUMNS = "amount, description, category_id, user_id, id, created_at, updated_at"
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _backfill_created_at(table: str) -> None:
+    op.execute(
+        f"UPDATE {table} SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL"
+    )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        _backfill_created_at("transactions")
+        with op.batch_alter_table("transactions") as batch_op:
+            batch_op.alter_column("created_at", existing_type=sa.DateTime(), nullable=False)
+        return
+
+    op.execute("ALTER TABLE transactions RENAME TO transactions_unpartitioned")
+    op.execute("ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_transactions_id RENAME TO ix_transactions_unpartitioned_id")
+    op.execute("ALTER INDEX ix_transactions_user_id RENAME TO ix_transactions_unpartitioned_user_id")
+    _backfill_created_at("transactions_unpartitioned")
+
+    op.execute("""
+        CREATE TABLE transactions (
+            amount DOUBLE PRECISION,
+            description VARCHAR,
+            category_id INTEGER REFERENCES categories (id),
+            user_id INTEGER,
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.create_index(op.f('ix_transactions_id'), 'transactions', ['id'], unique=False)
+    op.create_index(op.f('ix_transactions_user_id'), 'transactions', ['user_id'], unique=False)
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    first = bind.execute(sa.text("SELECT min(created_at) FROM transactions_unpartitioned")).scalar()
+    today = datetime.utcnow().date()
+    month = date((first or today).year, (first or today).month, 1)
+    last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE transactions_y{month.year}m{month.month:02d} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+        month = next_month
+
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_unpartitioned")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.execute("DROP TABLE transactions_unpartitioned")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        with op.batch_alter_table("transactions") as batch_op:
+            batch_op.alter_column("created_at", existing_type=sa.DateTime(), nullable=True)
+        return
+
+    op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+    op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+    op.execute("ALTER INDEX ix_transactions_id RENAME TO ix_transactions_partitioned_id")
+    op.execute("ALTER INDEX ix_transactions_user_id RENAME TO ix_transactions_partitioned_user_id")
+
+    op.execute("""
+        CREATE TABLE transactions (
+            amount DOUBLE PRECISION,
+            description VARCHAR,
+            category_id INTEGER REFERENCES categories (id),
+            user_id INTEGER,
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            updated_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.create_index(op.f('ix_transactions_id'), 'transactions', ['id'], unique=False)
+    op.create_index(op.f('ix_transactions_user_id'), 'transactions', ['user_id'], unique=False)
+
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_partitioned")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.execute("DROP TABLE transactions_partitioned")
@@ -0,0 +1,28 @@
+"""
+Эндпоинт метрик в формате Prometheus.
+
+Attributes:
+    router (APIRouter): Роутер FastAPI для эндпоинта /metrics
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ...metrics import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Текущие значения метрик приложения.
+
+    Returns:
+        PlainTextResponse: Метрики в текстовом формате Prometheus 0.0.4
+
+    Example:
+        GET /metrics
+        Response:
+            # HELP bot_messages_sent_total Исходящие сообщения бота
+            # TYPE bot_messages_sent_total counter
+            bot_messages_sent_total{method="send_message"} 42
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -7,28 +7,43 @@ API эндпоинты для работы с транзакциями.
 Attributes:
     router (APIRouter): Роутер FastAPI для эндпоинтов транзакций
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query
 from sqlalchemy.orm import Session
-from typing import List
-from ...database import get_db
+from datetime import datetime, timezone
+from typing import Annotated, List, Optional
+from ...archive import archived_transactions, created_between
+from ...autocomplete import description_index
+from ...database import get_db, shards
+from ...idempotency import save_transaction
+from ...ledger_cache import ledger_cache
 from ...models.transaction import Transaction
 from ...schemas.transaction import TransactionCreate, Transaction as TransactionSchema
 
 router = APIRouter()
 
 @router.get("/transactions/", response_model=List[TransactionSchema])
-def get_transactions(db: Session = Depends(get_db)):
+def get_transactions(date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                     user_id: Optional[int] = None, db: Session = Depends(get_db)):
     """
     Получение списка всех транзакций.
 
+    Включает транзакции, перенесенные в архив (см. app.archive). При заданном
+    периоде PostgreSQL читает только партиции transactions из этого периода.
+    При шардировании запрос с user_id читает один шард, а без него
+    выполняется на всех шардах параллельно (см. app.sharding).
+
     Args:
+        date_from (datetime, optional): Начало периода включительно,
+            время со смещением приводится к UTC
+        date_to (datetime, optional): Конец периода не включая
+        user_id (int, optional): Только транзакции этого пользователя
         db (Session): Сессия базы данных, внедряется через FastAPI Depends
 
     Returns:
         List[Transaction]: Список всех транзакций в базе данных
 
     Example:
-        GET /api/v1/transactions/
+        GET /api/v1/transactions/?date_from=2024-01-01&date_to=2024-02-01
         Response: [
             {
                 "id": 1,
@@ -41,26 +56,88 @@ def get_transactions(db: Session = Depends(get_db)):
             ...
         ]
     """
-    return db.query(Transaction).all()
+    # created_at хранится в UTC без часового пояса
+    date_from, date_to = _naive_utc(date_from), _naive_utc(date_to)
+
+    def load(db: Session) -> list:
+        query = db.query(Transaction).filter(*created_between(date_from, date_to))
+        if user_id is not None:
+            query = query.filter(Transaction.user_id == user_id)
+        return archived_transactions(db, user_id, date_from, date_to) + query.all()
+
+    if not shards.enabled:
+        return load(db)
+    if user_id is not None:
+        shard_db = shards.session_for(user_id)
+        try:
+            return load(shard_db)
+        finally:
+            shard_db.close()
+    return [row for rows in shards.fan_out(load) for row in rows]
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+@router.get("/transactions/autocomplete", response_model=List[str])
+def autocomplete_descriptions(user_id: int, prefix: str = "", category_id: Optional[int] = None,
+                              limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    """
+    Подсказки описаний транзакций пользователя.
+
+    Отвечает из префиксного индекса в памяти (см. app.autocomplete), к БД
+    обращается только при первом запросе для пользователя.
+
+    Args:
+        user_id (int): ID пользователя Telegram
+        prefix (str): Начало описания, без учета регистра
+        category_id (int, optional): Только описания этой категории
+        limit (int): Максимальное число подсказок
+        db (Session): Сессия базы данных, внедряется через FastAPI Depends
+
+    Returns:
+        List[str]: Описания в порядке убывания частоты
+
+    Example:
+        GET /api/v1/transactions/autocomplete?user_id=123456789&prefix=пя
+        Response: ["Пятёрочка", "Пятница кино"]
+    """
+    if not shards.enabled:
+        return description_index.suggest(db, user_id, prefix, category_id, limit)
+    shard_db = shards.session_for(user_id)
+    try:
+        return description_index.suggest(shard_db, user_id, prefix, category_id, limit)
+    finally:
+        shard_db.close()
 
 @router.post("/transactions/", response_model=TransactionSchema)
-def create_transaction(transaction: TransactionCreate, db: Session = Depends(get_db)):
+def create_transaction(transaction: TransactionCreate, db: Session = Depends(get_db),
+                       idempotency_key: Annotated[Optional[str], Header(max_length=200)] = None):
     """
         Создание новой транзакции.
 
+        При шардировании транзакция записывается в шард пользователя
+        transaction.user_id. Повтор запроса с тем же заголовком
+        Idempotency-Key в течение IDEMPOTENCY_WINDOW_HOURS возвращает
+        ранее созданную транзакцию вместо новой (см. app.idempotency).
+
         Args:
             transaction (TransactionCreate): Данные для создания транзакции
             db (Session): Сессия базы данных, внедряется через FastAPI Depends
+            idempotency_key (str, optional): Заголовок Idempotency-Key клиента
 
         Returns:
             Transaction: Созданная транзакция
 
         Example:
             POST /api/v1/transactions/
+            Idempotency-Key: 6f1c2d3e-0a9b-4c8d-9e7f-123456789abc
             Request body: {
                 "amount": 1000.0,
                 "description": "Продукты",
-                "category_id": 1
+                "category_id": 1,
+                "user_id": 123456789
             }
             Response: {
                 "id": 1,
@@ -71,8 +148,24 @@ def create_transaction(transaction: TransactionCreate, db: Session = Depends(get
                 "created_at": "2024-01-16T12:00:00"
             }
         """
-    db_transaction = Transaction(**transaction.dict())
-    db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+    key = f"api:{transaction.user_id}:{idempotency_key}" if idempotency_key else None
+    if not shards.enabled:
+        return _save_transaction(db, transaction, key)
+    shard_db = shards.session_for(transaction.user_id)
+    try:
+        return _save_transaction(shard_db, transaction, key)
+    finally:
+        shard_db.close()
+
+
+def _save_transaction(db: Session, transaction: TransactionCreate, key: Optional[str]) -> Transaction:
+    with ledger_cache.writing(transaction.user_id), description_index.writing(transaction.user_id):
+        db_transaction, created = save_transaction(db, Transaction(**transaction.dict()), key)
+        if not created:
+            return db_transaction
+        db.refresh(db_transaction)
+        ledger_cache.append(db_transaction.user_id, db_transaction.category_id,
+                            db_transaction.amount, db_transaction.created_at)
+        description_index.add(db_transaction.user_id, db_transaction.category_id, db_transaction.description)
     return db_transaction
+
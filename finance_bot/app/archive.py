@@ -0,0 +1,328 @@
+"""
+Архивация старых транзакций для Finance Tracker Bot.
+
+Транзакции старше ARCHIVE_HORIZON_DAYS переносятся из таблицы transactions
+в таблицу transactions_archive: по одному сжатому блоку на пользователя и
+месяц, где столбцы хранятся упакованными массивами. Суммы по категориям
+накапливаются в transaction_rollups, поэтому статистика читает итоги,
+а не распаковывает архив. Функции чтения объединяют горячие и архивные
+данные, и обработчикам не нужно знать, где лежит транзакция.
+
+Запуск архивации (при шардировании - на всех шардах параллельно):
+    python -m app.archive --horizon-days 365
+
+Functions:
+    archive_transactions(): Перенос старых транзакций в архив
+    user_totals(): Суммы пользователя по типу категории с учетом архива
+    created_between(): Условия на период для запросов к transactions
+    archived_transactions(): Распакованные архивные транзакции
+    pack_rows(): Упаковка транзакций в сжатый блок
+    unpack_rows(): Распаковка сжатого блока
+"""
+
+
+import argparse
+import json
+import struct
+import sys
+import zlib
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import dialect_insert, shards
+from .models.archive import TransactionArchive, TransactionRollup
+from .models.transaction import Category, Transaction
+
+PAYLOAD_VERSION = 1
+EPOCH = datetime(1970, 1, 1)
+
+_HEADER = struct.Struct("<BI")
+_COLUMNS = (("id", "q"), ("category_id", "q"), ("amount", "d"), ("created_at", "d"), ("updated_at", "d"))
+
+
+def _to_timestamp(value: Optional[datetime]) -> float:
+    return (value - EPOCH).total_seconds() if value is not None else float("nan")
+
+
+def _from_timestamp(value: float) -> Optional[datetime]:
+    return EPOCH + timedelta(seconds=value) if value == value else None
+
+
+def pack_rows(rows: List[dict]) -> bytes:
+    """
+    Упаковывает транзакции в сжатый колоночный блок.
+
+    Числовые столбцы хранятся массивами фиксированной ширины, описания -
+    JSON-списком. Весь блок сжимается zlib.
+
+    Args:
+        rows (List[dict]): Транзакции с ключами id, amount, description,
+            category_id, created_at, updated_at
+
+    Returns:
+        bytes: Сжатый блок
+    """
+    columns = {
+        "id": array("q", (row["id"] for row in rows)),
+        "category_id": array("q", (row["category_id"] or 0 for row in rows)),
+        "amount": array("d", (row["amount"] or 0.0 for row in rows)),
+        "created_at": array("d", (_to_timestamp(row["created_at"]) for row in rows)),
+        "updated_at": array("d", (_to_timestamp(row["updated_at"]) for row in rows)),
+    }
+    parts = [_HEADER.pack(PAYLOAD_VERSION, len(rows))]
+    for name, _ in _COLUMNS:
+        column = columns[name]
+        if sys.byteorder == "big":
+            column.byteswap()
+        parts.append(column.tobytes())
+    parts.append(json.dumps([row["description"] for row in rows], ensure_ascii=False).encode())
+    return zlib.compress(b"".join(parts), 9)
+
+
+def unpack_rows(user_id: int, payload: bytes) -> List[dict]:
+    """
+    Распаковывает блок, созданный pack_rows.
+
+    Args:
+        user_id (int): ID пользователя, которому принадлежит блок
+        payload (bytes): Сжатый блок
+
+    Returns:
+        List[dict]: Транзакции в формате схемы Transaction
+    """
+    data = zlib.decompress(payload)
+    version, count = _HEADER.unpack_from(data)
+    if version != PAYLOAD_VERSION:
+        raise ValueError(f"Неизвестная версия архивного блока: {version}")
+
+    offset = _HEADER.size
+    columns = {}
+    for name, typecode in _COLUMNS:
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(data[offset:offset + size])
+        if sys.byteorder == "big":
+            column.byteswap()
+        columns[name] = column
+        offset += size
+    descriptions = json.loads(data[offset:].decode())
+
+    return [
+        {
+            "id": columns["id"][i],
+            "amount": columns["amount"][i],
+            "description": descriptions[i],
+            "category_id": columns["category_id"][i] or None,
+            "user_id": user_id,
+            "created_at": _from_timestamp(columns["created_at"][i]),
+            "updated_at": _from_timestamp(columns["updated_at"][i]),
+        }
+        for i in range(count)
+    ]
+
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _append_to_archive(db: Session, user_id: int, period: date, rows: List[dict]):
+    archive = db.query(TransactionArchive).filter(
+        TransactionArchive.user_id == user_id,
+        TransactionArchive.period == period
+    ).first()
+
+    if archive is None:
+        archive = TransactionArchive(user_id=user_id, period=period)
+        db.add(archive)
+    else:
+        rows = unpack_rows(user_id, archive.payload) + rows
+
+    rows.sort(key=lambda row: (row["created_at"], row["id"]))
+    archive.payload = pack_rows(rows)
+    archive.row_count = len(rows)
+
+
+def _add_to_rollups(db: Session, user_id: int, period: date, rows: List[dict]):
+    totals = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        total = totals[row["category_id"]]
+        total[0] += row["amount"] or 0.0
+        total[1] += 1
+
+    now = datetime.utcnow()
+    insert = dialect_insert(db, TransactionRollup)
+    db.execute(
+        insert.values([
+            {"user_id": user_id, "period": period, "category_id": category_id, "total": amount,
+             "row_count": count, "created_at": now, "updated_at": now}
+            for category_id, (amount, count) in totals.items()
+        ]).on_conflict_do_update(
+            index_elements=["user_id", "period", "category_id"],
+            set_={
+                "total": TransactionRollup.total + insert.excluded.total,
+                "row_count": TransactionRollup.row_count + insert.excluded.row_count,
+                "updated_at": now,
+            }
+        )
+    )
+
+
+def archive_transactions(db: Session, horizon_days: int = None, batch_size: int = 5000,
+                         now: datetime = None) -> int:
+    """
+    Переносит транзакции старше горизонта в архив.
+
+    Каждая пачка архивируется и удаляется из transactions в одной транзакции
+    БД, поэтому прерванный запуск можно просто повторить.
+
+    Args:
+        db (Session): Сессия базы данных
+        horizon_days (int): Возраст транзакций в днях, по умолчанию ARCHIVE_HORIZON_DAYS
+        batch_size (int): Число транзакций в одной пачке
+        now (datetime): Текущее время UTC, для тестов
+
+    Returns:
+        int: Число перенесенных транзакций
+    """
+    if horizon_days is None:
+        horizon_days = settings.ARCHIVE_HORIZON_DAYS
+    cutoff = (now or datetime.utcnow()) - timedelta(days=horizon_days)
+
+    archived = 0
+    while True:
+        rows = db.execute(
+            select(Transaction.id, Transaction.amount, Transaction.description, Transaction.category_id,
+                   Transaction.user_id, Transaction.created_at, Transaction.updated_at)
+            .where(Transaction.created_at < cutoff, Transaction.user_id.is_not(None))
+            .order_by(Transaction.user_id, Transaction.created_at, Transaction.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+
+        groups = defaultdict(list)
+        for row in rows:
+            groups[(row["user_id"], month_start(row["created_at"]))].append(dict(row))
+
+        for (user_id, period), group in groups.items():
+            _append_to_archive(db, user_id, period, group)
+            _add_to_rollups(db, user_id, period, group)
+
+        # Условие на created_at позволяет PostgreSQL не просматривать свежие партиции
+        db.execute(delete(Transaction).where(
+            Transaction.id.in_([row["id"] for row in rows]),
+            Transaction.created_at < cutoff
+        ))
+        db.commit()
+        archived += len(rows)
+
+    return archived
+
+
+def user_totals(db: Session, user_id: int, date_from: datetime = None,
+                date_to: datetime = None) -> Dict[str, float]:
+    """
+    Суммы транзакций пользователя по типу категории, включая архив.
+
+    Условия на created_at передаются в запрос как есть, поэтому PostgreSQL
+    читает только партиции из диапазона (см. app.partitions). Итоги архива
+    хранятся по месяцам, поэтому для архива границы округляются до месяца.
+
+    Args:
+        db (Session): Сессия базы данных
+        user_id (int): ID пользователя Telegram
+        date_from (datetime): Начало периода включительно, None - без ограничения
+        date_to (datetime): Конец периода не включая, None - без ограничения
+
+    Returns:
+        Dict[str, float]: Сумма по типу категории ("income", "expense")
+    """
+    totals: Dict[str, float] = defaultdict(float)
+
+    hot = db.query(Category.type, func.sum(Transaction.amount)).select_from(Transaction).join(Category).filter(
+        Transaction.user_id == user_id,
+        *created_between(date_from, date_to)
+    ).group_by(Category.type)
+
+    archived = db.query(Category.type, func.sum(TransactionRollup.total)).select_from(TransactionRollup).join(
+        Category, Category.id == TransactionRollup.category_id
+    ).filter(
+        TransactionRollup.user_id == user_id,
+        *_periods_between(TransactionRollup, date_from, date_to)
+    ).group_by(Category.type)
+
+    for type_, amount in list(hot) + list(archived):
+        totals[type_] += amount or 0.0
+    return totals
+
+
+def created_between(date_from: datetime = None, date_to: datetime = None) -> list:
+    """
+    Условия на Transaction.created_at для полуинтервала [date_from, date_to).
+
+    Returns:
+        list: Условия для filter(); пустой список, если границы не заданы
+    """
+    conditions = []
+    if date_from is not None:
+        conditions.append(Transaction.created_at >= date_from)
+    if date_to is not None:
+        conditions.append(Transaction.created_at < date_to)
+    return conditions
+
+
+def _periods_between(model, date_from: datetime = None, date_to: datetime = None) -> list:
+    conditions = []
+    if date_from is not None:
+        conditions.append(model.period >= month_start(date_from))
+    if date_to is not None:
+        # period - это дата: SQLite сравнивает ее с datetime как строки
+        last = date_to.date() if date_to.time() == datetime.min.time() else date_to.date() + timedelta(days=1)
+        conditions.append(model.period < last)
+    return conditions
+
+
+def archived_transactions(db: Session, user_id: int = None, date_from: datetime = None,
+                          date_to: datetime = None) -> List[dict]:
+    """
+    Распаковывает архивные транзакции всех пользователей или одного.
+
+    Args:
+        db (Session): Сессия базы данных
+        user_id (int): ID пользователя Telegram, None - все пользователи
+        date_from (datetime): Начало периода включительно, None - без ограничения
+        date_to (datetime): Конец периода не включая, None - без ограничения
+
+    Returns:
+        List[dict]: Транзакции в формате схемы Transaction
+    """
+    query = db.query(TransactionArchive.user_id, TransactionArchive.payload).filter(
+        *_periods_between(TransactionArchive, date_from, date_to)
+    )
+    if user_id is not None:
+        query = query.filter(TransactionArchive.user_id == user_id)
+
+    rows = []
+    for archive_user_id, payload in query.order_by(TransactionArchive.user_id, TransactionArchive.period):
+        rows.extend(
+            row for row in unpack_rows(archive_user_id, payload)
+            if (date_from is None or row["created_at"] >= date_from)
+            and (date_to is None or row["created_at"] < date_to)
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенос старых транзакций в архив")
+    parser.add_argument("--horizon-days", type=int, default=settings.ARCHIVE_HORIZON_DAYS)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    count = sum(shards.fan_out(lambda db: archive_transactions(db, args.horizon_days, args.batch_size)))
+    print(f"Перенесено в архив транзакций: {count}")
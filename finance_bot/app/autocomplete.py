@@ -0,0 +1,196 @@
+"""
+Автодополнение описаний транзакций.
+
+Для каждого пользователя строится префиксный индекс описаний его
+транзакций: отсортированный список описаний в нижнем регистре и частота
+каждого. Подсказки по префиксу - это двоичный поиск диапазона ключей
+и выбор самых частых, без LIKE-запросов к БД.
+
+Индекс пользователя строится при первом обращении одним GROUP BY
+по transactions и дополняется при каждой вставке из бота и API.
+Вставка оборачивается в DescriptionIndex.writing(): индекс, построение
+которого пересеклось с записью пользователя, не сохраняется (см. app.user_loads).
+В памяти хранятся индексы AUTOCOMPLETE_USERS последних пользователей.
+
+Classes:
+    PrefixIndex: Частотный префиксный индекс строк
+    DescriptionIndex: Индексы описаний пользователей по категориям
+
+Attributes:
+    description_index (DescriptionIndex): Глобальный индекс описаний
+"""
+
+
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models.transaction import Transaction
+from .user_loads import UserLoads
+
+
+class PrefixIndex:
+    """
+    Частотный префиксный индекс строк без учета регистра.
+
+    Attributes:
+        keys (List[str]): Отсортированные строки в нижнем регистре
+        counts (Dict[str, int]): Частота каждой строки
+        labels (Dict[str, str]): Написание строки для показа, первое добавленное
+    """
+
+    __slots__ = ("keys", "counts", "labels")
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.counts: Dict[str, int] = {}
+        self.labels: Dict[str, str] = {}
+
+    def add(self, text: str, count: int = 1):
+        key = text.casefold()
+        if key in self.counts:
+            self.counts[key] += count
+        else:
+            insort(self.keys, key)
+            self.counts[key] = count
+            self.labels[key] = text
+
+    def suggest(self, prefix: str = "", limit: int = 5) -> List[str]:
+        """
+        Самые частые строки, начинающиеся с prefix.
+
+        Args:
+            prefix (str): Начало строки, пустая строка - все строки
+            limit (int): Максимальное число подсказок
+        """
+        prefix = prefix.casefold()
+        lo = bisect_left(self.keys, prefix)
+        # Все ключи с префиксом лежат подряд и меньше prefix + максимальный символ
+        hi = bisect_left(self.keys, prefix + "\U0010ffff", lo)
+        best = heapq.nsmallest(limit, self.keys[lo:hi], key=lambda key: -self.counts[key])
+        return [self.labels[key] for key in best]
+
+
+class DescriptionIndex:
+    """
+    Индексы описаний пользователей: общий и по каждой категории.
+
+    Методы безопасны для вызова из потока API и из цикла событий бота:
+    индексы читаются и меняются только под блокировкой.
+
+    Attributes:
+        max_users (int): Сколько пользователей держать в памяти
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._users: "OrderedDict[int, Dict[Optional[int], PrefixIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loads = UserLoads(self._lock)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def suggest(self, db: Session, user_id: int, prefix: str = "", category_id: int = None,
+                limit: int = 5) -> List[str]:
+        """
+        Самые частые описания пользователя, начинающиеся с prefix.
+
+        Args:
+            db (Session): Сессия БД (шарда) пользователя, нужна только при первом обращении
+            user_id (int): ID пользователя Telegram
+            prefix (str): Начало описания
+            category_id (int): Только описания этой категории, None - всех
+            limit (int): Максимальное число подсказок
+
+        Returns:
+            List[str]: Описания в порядке убывания частоты
+        """
+        indexes = self._get(db, user_id)
+        with self._lock:
+            index = indexes.get(category_id)
+            return index.suggest(prefix, limit) if index is not None else []
+
+    def writing(self, user_id: int):
+        """
+        Контекст вставки транзакции пользователя: от начала вставки до add().
+
+        Индекс, построение которого пересеклось с этим интервалом, не сохраняется:
+        он может уже учитывать описание, которое затем добавит add().
+        """
+        return self._loads.writing(user_id)
+
+    def add(self, user_id: int, category_id: Optional[int], description: Optional[str]):
+        """
+        Учитывает описание новой транзакции, если индекс пользователя уже построен.
+
+        Вызывается внутри writing().
+        """
+        if not description:
+            return
+        with self._lock:
+            indexes = self._users.get(user_id)
+            if indexes is not None:
+                _add(indexes, category_id, description, 1)
+
+    def _get(self, db: Session, user_id: int) -> Dict[Optional[int], PrefixIndex]:
+        with self._lock:
+            indexes = self._users.get(user_id)
+            if indexes is not None:
+                self._users.move_to_end(user_id)
+                return indexes
+            loading = self._loads.begin(user_id)
+
+        try:
+            indexes = self._build(db, user_id)
+        except BaseException:
+            with self._lock:
+                self._loads.end(user_id, loading)
+            raise
+
+        with self._lock:
+            if not self._loads.end(user_id, loading):
+                return indexes
+            # Индекс, построенный параллельно и уже дополненный add(), не затираем
+            existing = self._users.get(user_id)
+            if existing is not None:
+                return existing
+            self._users[user_id] = indexes
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return indexes
+
+    @staticmethod
+    def _build(db: Session, user_id: int) -> Dict[Optional[int], PrefixIndex]:
+        rows = db.query(Transaction.category_id, Transaction.description, func.count()).filter(
+            Transaction.user_id == user_id,
+            Transaction.description.is_not(None),
+            Transaction.description != ""
+        ).group_by(Transaction.category_id, Transaction.description).order_by(
+            # Первым встреченное написание показывается пользователю: берем самое частое
+            func.count().desc(), Transaction.description
+        )
+
+        indexes = defaultdict(PrefixIndex)
+        for category_id, description, count in rows:
+            _add(indexes, category_id, description, count)
+        return indexes
+
+
+def _add(indexes: Dict[Optional[int], PrefixIndex], category_id: Optional[int], description: str, count: int):
+    indexes[None].add(description, count)
+    if category_id is not None:
+        indexes[category_id].add(description, count)
+
+
+description_index = DescriptionIndex(settings.AUTOCOMPLETE_USERS)
@@ -0,0 +1,120 @@
+"""
+Маршрутизация входящих сообщений бота.
+
+Вместо цепочки обработчиков с filters.regex бот регистрирует в Pyrogram
+один обработчик, который выбирает функцию по таблицам:
+
+- текст кнопки меню - точное совпадение в словаре;
+- команда "/name" - словарь команд, аргументы кладутся в message.command
+  так же, как это делает filters.command;
+- любой другой текст - обработчик ввода, если у пользователя есть
+  незавершенный диалог (запись в словаре состояний).
+
+Остальные сообщения отбрасываются за O(1) без регулярных выражений
+и без вызова обработчиков.
+
+Classes:
+    MessageRouter: Таблицы маршрутов и диспетчер сообщений
+"""
+
+
+from typing import Awaitable, Callable, Container, Dict, Optional
+
+from ..metrics import metrics
+
+Handler = Callable[..., Awaitable[None]]
+
+
+class MessageRouter:
+    """
+    Таблицы маршрутов сообщений бота.
+
+    Attributes:
+        buttons (Dict[str, Handler]): Обработчики по тексту кнопки
+        commands (Dict[str, Handler]): Обработчики по имени команды без "/"
+        states (Container[int]): ID пользователей с незавершенным диалогом
+        text_handler (Handler): Обработчик свободного текста в диалоге
+    """
+
+    def __init__(self, states: Container[int]):
+        self.buttons: Dict[str, Handler] = {}
+        self.commands: Dict[str, Handler] = {}
+        self.states = states
+        self.text_handler: Optional[Handler] = None
+
+    def button(self, *texts: str):
+        """
+        Регистрирует обработчик нажатия кнопок с текстами texts.
+        """
+        def decorator(handler: Handler) -> Handler:
+            for text in texts:
+                self.buttons[text] = handler
+            return handler
+        return decorator
+
+    def command(self, *names: str):
+        """
+        Регистрирует обработчик команд names (без "/", без учета регистра).
+        """
+        def decorator(handler: Handler) -> Handler:
+            for name in names:
+                self.commands[name.lower()] = handler
+            return handler
+        return decorator
+
+    def text(self, handler: Handler) -> Handler:
+        """
+        Регистрирует обработчик свободного текста для пользователей в диалоге.
+        """
+        self.text_handler = handler
+        return handler
+
+    def resolve(self, message, username: str = None) -> Optional[Handler]:
+        """
+        Выбирает обработчик сообщения.
+
+        Args:
+            message (Message): Входящее сообщение
+            username (str): Имя бота: команды с чужим @username отбрасываются
+
+        Returns:
+            Handler: Обработчик или None, если сообщение не нужно обрабатывать
+        """
+        text = message.text
+        if not text:
+            return None
+
+        handler = self.buttons.get(text)
+        if handler is not None:
+            return handler
+
+        if text[0] == "/":
+            parts = text[1:].split()
+            if not parts:
+                return None
+            name, _, mention = parts[0].partition("@")
+            if mention and (username is None or mention.lower() != username.lower()):
+                return None
+            handler = self.commands.get(name.lower())
+            if handler is not None:
+                message.command = [name.lower(), *parts[1:]]
+            return handler
+
+        user = message.from_user
+        if self.text_handler is not None and user is not None and user.id in self.states:
+            return self.text_handler
+        return None
+
+    async def dispatch(self, client, message):
+        """
+        Обработчик Pyrogram: передает сообщение выбранному обработчику.
+        """
+        me = getattr(client, "me", None)
+        handler = self.resolve(message, me.username if me is not None else None)
+        if handler is None:
+            metrics.inc("bot_messages_discarded_total")
+            return
+        await handler(client, message)
+
+
+metrics.describe("bot_messages_discarded_total", "counter", "Входящие сообщения без подходящего обработчика")
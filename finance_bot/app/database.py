@@ -1,10 +1,92 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
 from .config import settings
+from . import profiling  # noqa: F401 - подключает счетчики SQL-запросов к Engine
+from .metrics import MeteredQueuePool, register_pool_metrics
+from .sharding import ShardRouter
 
-engine = create_engine(settings.DATABASE_URL)
+# Настройки SQLite для однопроцессной установки: WAL позволяет читать во время
+# записи, synchronous=NORMAL в режиме WAL не теряет зафиксированных транзакций
+# при сбое процесса, busy_timeout ждет блокировку записи вместо ошибки
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,
+    "cache_size": -16000,
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def make_engine(url: str) -> Engine:
+    """
+    Создает движок для PostgreSQL или SQLite.
+
+    Для файла SQLite каждое соединение получает SQLITE_PRAGMAS. База
+    в памяти остается на стандартном пуле SQLAlchemy с одним соединением.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return create_engine(url, poolclass=MeteredQueuePool)
+    if parsed.database in (None, "", ":memory:"):
+        return create_engine(url)
+    sqlite_engine = create_engine(url, poolclass=MeteredQueuePool)
+    event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+    return sqlite_engine
+
+
+def dialect_insert(db, table):
+    """
+    INSERT с поддержкой ON CONFLICT для СУБД сессии.
+
+    PostgreSQL и SQLite поддерживают одинаковые on_conflict_do_nothing()
+    и on_conflict_do_update(), поэтому вызывающему коду не нужно знать СУБД.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT не поддерживается для {dialect}")
+
+
+engine = make_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Без SHARD_DATABASE_URLS все данные пользователей лежат в основной БД
+if settings.SHARD_DATABASE_URLS:
+    shards = ShardRouter([
+        engine if url == settings.DATABASE_URL else make_engine(url)
+        for url in settings.SHARD_DATABASE_URLS
+    ])
+else:
+    shards = ShardRouter([engine], enabled=False)
+
+
+def _register_pools():
+    # У шарда метка - его номер, у основной БД вне шардов - main
+    labels = {}
+    if shards.enabled:
+        for index, shard_engine in enumerate(shards.engines):
+            labels.setdefault(shard_engine, str(index))
+    labels.setdefault(engine, "main")
+    for labeled_engine, label in labels.items():
+        if isinstance(labeled_engine.pool, MeteredQueuePool):
+            register_pool_metrics(labeled_engine, label)
+
+
+_register_pools()
+
 Base = declarative_base()
 
 def get_db():
@@ -12,4 +94,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,108 @@
+"""
+Идемпотентная вставка транзакций.
+
+Бот передает ключ из ID чата и сообщения Telegram, API - заголовок
+Idempotency-Key клиента. Транзакция вставляется сразу, а ключ занимается
+INSERT ... ON CONFLICT DO NOTHING RETURNING в той же транзакции БД, поэтому
+первая попытка стоит двух INSERT. Если ключ уже занят, вставленная строка
+удаляется, и повтор отвечает ранее созданной транзакцией. Ключ хранит
+id и created_at транзакции: по ним поиск попадает в одну партицию
+transactions (см. app.partitions). Если транзакция по живому ключу уже
+перенесена в архив (см. app.archive), ключ считается устаревшим
+и занимается заново.
+
+Ключи хранятся IDEMPOTENCY_WINDOW_HOURS часов, затем удаляются
+purge_idempotency_keys(), поэтому окно дедупликации и объем таблицы
+ограничены.
+
+Functions:
+    save_transaction(): Вставка транзакции с проверкой ключа
+    find_transaction(): Транзакция, созданная по ключу
+    purge_idempotency_keys(): Удаление ключей старше окна
+"""
+
+
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import dialect_insert
+from .models.idempotency import IdempotencyKey
+from .models.transaction import Transaction
+
+
+def find_transaction(db: Session, key: str) -> Optional[Transaction]:
+    return db.query(Transaction).join(
+        IdempotencyKey,
+        (IdempotencyKey.transaction_id == Transaction.id)
+        & (IdempotencyKey.transaction_created_at == Transaction.created_at)
+    ).filter(IdempotencyKey.key == key).first()
+
+
+def _claim_key(db: Session, key: str, transaction: Transaction) -> bool:
+    now = datetime.utcnow()
+    return db.execute(
+        dialect_insert(db, IdempotencyKey).values(
+            key=key, user_id=transaction.user_id, transaction_id=transaction.id,
+            transaction_created_at=transaction.created_at, created_at=now, updated_at=now
+        ).on_conflict_do_nothing(index_elements=["key"]).returning(IdempotencyKey.id)
+    ).first() is not None
+
+
+def save_transaction(db: Session, transaction: Transaction, key: str = None) -> Tuple[Transaction, bool]:
+    """
+    Сохраняет транзакцию, если ключ еще не использовался, и фиксирует изменения.
+
+    Args:
+        db (Session): Сессия БД (шарда) пользователя
+        transaction (Transaction): Новая транзакция
+        key (str): Ключ идемпотентности, None - без проверки
+
+    Returns:
+        Tuple[Transaction, bool]: Сохраненная или ранее созданная транзакция
+            и признак того, что она создана сейчас
+    """
+    db.add(transaction)
+    if key is not None:
+        db.flush()
+        claimed = _claim_key(db, key, transaction)
+        if not claimed:
+            existing = find_transaction(db, key)
+            if existing is None:
+                # Транзакция по ключу уже в архиве: отвечать нечем, занимаем ключ заново
+                db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+                claimed = _claim_key(db, key, transaction)
+                if not claimed:
+                    existing = find_transaction(db, key)
+        if not claimed:
+            # Ключ уже занят: удаляем свою строку вместо rollback(),
+            # чтобы не откатывать остальные изменения сессии
+            db.delete(transaction)
+            db.flush()
+            db.commit()
+            return existing, False
+    db.commit()
+    return transaction, True
+
+
+def purge_idempotency_keys(db: Session, window_hours: int = None, now: datetime = None) -> int:
+    """
+    Удаляет ключи старше окна дедупликации.
+
+    Args:
+        db (Session): Сессия базы данных
+        window_hours (int): Окно в часах, по умолчанию IDEMPOTENCY_WINDOW_HOURS
+        now (datetime): Текущее время UTC, для тестов
+
+    Returns:
+        int: Число удаленных ключей
+    """
+    if window_hours is None:
+        window_hours = settings.IDEMPOTENCY_WINDOW_HOURS
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=window_hours)
+    deleted = db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)).rowcount
+    db.commit()
+    return deleted
@@ -3,14 +3,18 @@
 
 Создает начальные категории доходов и расходов в базе данных.
 Предотвращает дублирование категорий через проверку их существования.
+При шардировании категории создаются в основной БД и копируются в каждый
+шард с теми же id: клавиатура бота читает id из основной БД, а транзакции
+и их категории лежат в шарде.
 
 Functions:
     init_categories(): Инициализация базовых категорий
+    copy_categories(): Копирование справочника категорий в шард
 """
 
 
-from .database import SessionLocal
-from .models.transaction import Category
+from .database import SessionLocal, engine, shards
+from .models.transaction import Category, Transaction
 from sqlalchemy.exc import IntegrityError
 
 def init_categories():
@@ -40,7 +44,64 @@ def init_categories():
         """
 
     db = SessionLocal()
+    try:
+        _add_categories(db)
+        if not shards.enabled:
+            return
+        for index, (factory, shard_engine) in enumerate(zip(shards.sessionmakers, shards.engines)):
+            if shard_engine is engine:
+                continue
+            shard_db = factory()
+            try:
+                copy_categories(db, shard_db)
+            finally:
+                shard_db.close()
+            print(f"Категории скопированы в шард {index}")
+    finally:
+        db.close()
+
+
+def copy_categories(source, target):
+    """
+    Приводит справочник категорий target к справочнику source с теми же id.
+
+    Категории шарда, которых нет в основной БД или которые там называются
+    иначе, удаляются, недостающие добавляются с id из основной БД.
+
+    Args:
+        source (Session): Сессия основной БД
+        target (Session): Сессия шарда
+
+    Raises:
+        RuntimeError: Удаляемую категорию шарда используют его транзакции
+    """
+    categories = {category.id: (category.name, category.type) for category in source.query(Category)}
+    stale = [
+        category for category in target.query(Category)
+        if categories.get(category.id) != (category.name, category.type)
+    ]
+    if stale:
+        used = target.query(Transaction.category_id).filter(
+            Transaction.category_id.in_([category.id for category in stale])
+        ).distinct().all()
+        if used:
+            raise RuntimeError(
+                "Категории шарда не совпадают с основной БД и используются транзакциями: "
+                + ", ".join(str(category_id) for (category_id,) in used)
+            )
+        for category in stale:
+            target.delete(category)
+        target.flush()
+
+    present = {category_id for (category_id,) in target.query(Category.id)}
+    target.add_all(
+        Category(id=category_id, name=name, type=type_)
+        for category_id, (name, type_) in categories.items() if category_id not in present
+    )
+    target.commit()
+
 
+def _add_categories(db):
     expense_categories = [
         {"name": "Продукты", "type": "expense"},
         {"name": "Транспорт", "type": "expense"},
@@ -72,7 +133,6 @@ def init_categories():
         else:
             print(f"Категория {category['name']} уже существует")
 
-    db.close()
 
 if __name__ == "__main__":
     init_categories()
\ No newline at end of file
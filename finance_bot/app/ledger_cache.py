@@ -0,0 +1,301 @@
+"""
+Кэш журналов активных пользователей в памяти процесса.
+
+Журнал пользователя хранится не ORM-объектами, а компактными массивами
+array: для каждой категории - отсортированные метки времени и суммы
+транзакций, а также месячные итоги архива (см. app.archive). Сумма
+за период - это двоичный поиск границ и sum() по срезу массива, без
+обращения к БД.
+
+Журнал загружается при первом обращении, новые транзакции дописываются
+в него при вставке из бота и API. Кэш ограничен объемом памяти
+LEDGER_CACHE_BYTES: при превышении вытесняются давно не использованные
+журналы. Нулевой объем отключает кэш, и чтение идет из БД как раньше.
+
+Вставка транзакции оборачивается в LedgerCache.writing(): журнал,
+загрузка которого пересеклась с записью пользователя, возвращается
+вызывающему, но не кэшируется (см. app.user_loads).
+
+Classes:
+    UserLedger: Журнал одного пользователя
+    LedgerCache: LRU-кэш журналов с ограничением по памяти
+
+Attributes:
+    ledger_cache (LedgerCache): Глобальный кэш журналов
+"""
+
+
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from .archive import EPOCH, month_start, user_totals
+from .config import settings
+from .metrics import metrics
+from .models.archive import TransactionRollup
+from .models.transaction import Category, Transaction
+from .user_loads import UserLoads
+
+
+def _timestamp(value) -> float:
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return (value - EPOCH).total_seconds()
+
+
+class _Series:
+    """
+    Отсортированные по времени суммы одной категории.
+    """
+
+    __slots__ = ("times", "amounts")
+
+    def __init__(self):
+        self.times = array("d")
+        self.amounts = array("d")
+
+    def add(self, time: float, amount: float):
+        if not self.times or time >= self.times[-1]:
+            self.times.append(time)
+            self.amounts.append(amount)
+        else:
+            # Транзакции из API и бота могут прийти не по порядку created_at
+            index = bisect_left(self.times, time)
+            self.times.insert(index, time)
+            self.amounts.insert(index, amount)
+
+    def total(self, start: Optional[float], end: Optional[float]) -> Optional[float]:
+        """
+        Сумма за полуинтервал [start, end); None, если в нем нет записей.
+        """
+        lo = 0 if start is None else bisect_left(self.times, start)
+        hi = len(self.times) if end is None else bisect_left(self.times, end)
+        return sum(self.amounts[lo:hi]) if hi > lo else None
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.times) + sys.getsizeof(self.amounts)
+
+
+class UserLedger:
+    """
+    Журнал пользователя: транзакции и итоги архива по категориям.
+
+    Attributes:
+        hot (Dict[int, _Series]): Транзакции из таблицы transactions
+        archived (Dict[int, _Series]): Месячные итоги из transaction_rollups
+    """
+
+    __slots__ = ("hot", "archived", "nbytes")
+
+    def __init__(self):
+        self.hot: Dict[int, _Series] = defaultdict(_Series)
+        self.archived: Dict[int, _Series] = defaultdict(_Series)
+        self.nbytes = 0
+
+    def add(self, category_id: int, amount: float, created_at: datetime):
+        series = self.hot[category_id]
+        before = series.nbytes
+        series.add(_timestamp(created_at), amount or 0.0)
+        self.nbytes += series.nbytes - before
+
+    def category_totals(self, date_from: datetime = None, date_to: datetime = None) -> Dict[int, float]:
+        """
+        Суммы по категориям за полуинтервал [date_from, date_to).
+
+        Границы для итогов архива округляются до месяца так же,
+        как в app.archive.user_totals.
+        """
+        start = _timestamp(date_from) if date_from is not None else None
+        end = _timestamp(date_to) if date_to is not None else None
+        archive_start = _timestamp(month_start(date_from)) if date_from is not None else None
+
+        totals: Dict[int, float] = defaultdict(float)
+        for series_by_category, series_start in ((self.hot, start), (self.archived, archive_start)):
+            for category_id, series in series_by_category.items():
+                total = series.total(series_start, end)
+                if total is not None:
+                    totals[category_id] += total
+        return totals
+
+    def _measure(self):
+        self.nbytes = sum(series.nbytes for series in self.hot.values()) + sum(
+            series.nbytes for series in self.archived.values()
+        )
+
+
+class LedgerCache:
+    """
+    LRU-кэш журналов пользователей с ограничением по памяти.
+
+    Методы безопасны для вызова из потока API и из цикла событий бота:
+    кэш и журналы в нем читаются и меняются только под блокировкой.
+
+    Attributes:
+        max_bytes (int): Объем памяти под журналы, 0 - кэш отключен
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._ledgers: "OrderedDict[int, UserLedger]" = OrderedDict()
+        self._category_types: Dict[int, str] = {}
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._loads = UserLoads(self._lock)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._ledgers)
+
+    def clear(self):
+        with self._lock:
+            self._ledgers.clear()
+            self._category_types.clear()
+            self._nbytes = 0
+
+    def get(self, db: Session, user_id: int) -> UserLedger:
+        """
+        Журнал пользователя; при промахе загружается из БД.
+
+        Args:
+            db (Session): Сессия БД (шарда) пользователя
+            user_id (int): ID пользователя Telegram
+        """
+        with self._lock:
+            ledger = self._ledgers.get(user_id)
+            if ledger is not None:
+                self._ledgers.move_to_end(user_id)
+                metrics.inc("ledger_cache_hits_total")
+                return ledger
+            loading = self._loads.begin(user_id)
+
+        metrics.inc("ledger_cache_misses_total")
+        try:
+            ledger = self._load(db, user_id)
+        except BaseException:
+            with self._lock:
+                self._loads.end(user_id, loading)
+            raise
+        with self._lock:
+            if not self._loads.end(user_id, loading):
+                return ledger
+            previous = self._ledgers.pop(user_id, None)
+            if previous is not None:
+                self._nbytes -= previous.nbytes
+            self._ledgers[user_id] = ledger
+            self._nbytes += ledger.nbytes
+            self._evict()
+        return ledger
+
+    def writing(self, user_id: int):
+        """
+        Контекст вставки транзакции пользователя: от начала вставки до append().
+
+        Журнал, загрузка которого пересеклась с этим интервалом, не кэшируется:
+        он может уже содержать транзакцию, которую затем допишет append().
+
+        Example:
+            with ledger_cache.writing(user_id):
+                transaction, created = save_transaction(db, transaction, key)
+                if created:
+                    ledger_cache.append(user_id, ...)
+        """
+        return self._loads.writing(user_id)
+
+    def append(self, user_id: int, category_id: Optional[int], amount: float, created_at: datetime):
+        """
+        Дописывает новую транзакцию в журнал, если он уже в кэше.
+
+        Вызывается внутри writing(). Незагруженный журнал не трогаем:
+        при первом обращении он будет прочитан из БД вместе с этой транзакцией.
+        """
+        if category_id is None:
+            return
+        with self._lock:
+            ledger = self._ledgers.get(user_id)
+            if ledger is None:
+                return
+            before = ledger.nbytes
+            ledger.add(category_id, amount, created_at)
+            self._nbytes += ledger.nbytes - before
+            self._evict()
+
+    def user_totals(self, db: Session, user_id: int, date_from: datetime = None,
+                    date_to: datetime = None) -> Dict[str, float]:
+        """
+        Суммы пользователя по типу категории, как app.archive.user_totals.
+
+        При отключенном кэше запрос выполняется в БД.
+        """
+        if not self.enabled:
+            return user_totals(db, user_id, date_from, date_to)
+
+        ledger = self.get(db, user_id)
+        with self._lock:
+            by_category = ledger.category_totals(date_from, date_to)
+        types = self._types(db, by_category)
+        totals: Dict[str, float] = defaultdict(float)
+        for category_id, amount in by_category.items():
+            type_ = types.get(category_id)
+            if type_ is not None:
+                totals[type_] += amount
+        return totals
+
+    def _types(self, db: Session, category_ids) -> Dict[int, str]:
+        types = self._category_types
+        if any(category_id not in types for category_id in category_ids):
+            types = dict(db.query(Category.id, Category.type))
+            self._category_types = types
+        return types
+
+    def _load(self, db: Session, user_id: int) -> UserLedger:
+        ledger = UserLedger()
+        rows = db.query(Transaction.category_id, Transaction.amount, Transaction.created_at).filter(
+            Transaction.user_id == user_id,
+            Transaction.category_id.is_not(None)
+        ).order_by(Transaction.created_at)
+        for category_id, amount, created_at in rows:
+            series = ledger.hot[category_id]
+            series.times.append(_timestamp(created_at))
+            series.amounts.append(amount or 0.0)
+
+        rollups = db.query(TransactionRollup.category_id, TransactionRollup.period, TransactionRollup.total).filter(
+            TransactionRollup.user_id == user_id,
+            # Итоги без категории не входят в суммы по типу, а их None заставлял бы
+            # _types перечитывать справочник категорий при каждом вызове
+            TransactionRollup.category_id.is_not(None)
+        ).order_by(TransactionRollup.period)
+        for category_id, period, total in rollups:
+            series = ledger.archived[category_id]
+            series.times.append(_timestamp(period))
+            series.amounts.append(total or 0.0)
+
+        ledger._measure()
+        return ledger
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._ledgers:
+            _, ledger = self._ledgers.popitem(last=False)
+            self._nbytes -= ledger.nbytes
+            metrics.inc("ledger_cache_evictions_total")
+
+
+ledger_cache = LedgerCache(settings.LEDGER_CACHE_BYTES)
+
+metrics.describe("ledger_cache_hits_total", "counter", "Попадания в кэш журналов пользователей")
+metrics.describe("ledger_cache_misses_total", "counter", "Загрузки журналов пользователей из БД")
+metrics.describe("ledger_cache_evictions_total", "counter", "Вытеснения журналов из кэша")
+metrics.gauge("ledger_cache_bytes", "Память под журналы пользователей в кэше", lambda: ledger_cache.nbytes)
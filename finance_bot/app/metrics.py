@@ -0,0 +1,220 @@
+"""
+Метрики Finance Tracker Bot в формате Prometheus.
+
+Счетчики и гистограммы накапливаются в памяти процесса. Каждый поток пишет
+в собственный шард, поэтому запись метрики не требует блокировки: бот и
+API работают в разных потоках и не конкурируют друг с другом. Шарды
+суммируются только при чтении /metrics.
+
+Attributes:
+    LATENCY_BUCKETS (Tuple[float, ...]): Границы корзин гистограмм задержек, в секундах
+    metrics (Metrics): Глобальный реестр метрик приложения
+"""
+
+
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Shard:
+    """
+    Метрики, записанные одним потоком.
+
+    Attributes:
+        counters (Dict[Tuple[str, Labels], float]): Значения счетчиков
+        histograms (Dict[Tuple[str, Labels], List[float]]): Счетчики корзин,
+            за которыми следуют сумма и количество наблюдений
+    """
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+class Metrics:
+    """
+    Реестр метрик с выводом в текстовом формате Prometheus.
+
+    Example:
+        metrics.describe("bot_messages_sent_total", "counter", "Отправленные сообщения")
+        metrics.inc("bot_messages_sent_total", method="send_message")
+        metrics.render()
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._shards_lock = threading.Lock()
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+        self._gauges: Dict[Tuple[str, Labels], Callable[[], float]] = {}
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            # Блокировка нужна один раз на поток, а не на каждую запись
+            shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def describe(self, name: str, type_: str, help_text: str):
+        """
+        Регистрирует тип и описание метрики для строк # TYPE и # HELP.
+        """
+        self._descriptions[name] = (type_, help_text)
+
+    def gauge(self, name: str, help_text: str, func: Callable[[], float], **labels: str):
+        """
+        Регистрирует gauge, значение которого вычисляется при чтении метрик.
+        """
+        self.describe(name, "gauge", help_text)
+        self._gauges[(name, tuple(sorted(labels.items())))] = func
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        self._shard().counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name: str, value: float, **labels: str):
+        histograms = self._shard().histograms
+        key = (name, tuple(sorted(labels.items())))
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(self.buckets) + 3)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def collect(self):
+        """
+        Суммирует шарды всех потоков.
+
+        Returns:
+            Tuple[Dict, Dict]: Счетчики и гистограммы в формате шарда
+        """
+        counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # copy() атомарен под GIL, поэтому поток-владелец может продолжать запись
+            for key, value in shard.counters.copy().items():
+                counters[key] += value
+            for key, counts in shard.histograms.copy().items():
+                total = histograms.setdefault(key, [0] * len(counts))
+                for i, value in enumerate(list(counts)):
+                    total[i] += value
+        return counters, histograms
+
+    def render(self) -> str:
+        """
+        Формирует текст метрик в формате Prometheus exposition 0.0.4.
+        """
+        counters, histograms = self.collect()
+        lines: Dict[str, List[str]] = defaultdict(list)
+
+        for (name, labels), value in sorted(counters.items()):
+            lines[name].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), counts in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines[name].append(
+                    f"{name}_bucket{_format_labels(labels + (('le', le),))} {_format_value(cumulative)}"
+                )
+            lines[name].append(f"{name}_sum{_format_labels(labels)} {_format_value(counts[-2])}")
+            lines[name].append(f"{name}_count{_format_labels(labels)} {_format_value(counts[-1])}")
+
+        for (name, labels), func in self._gauges.items():
+            lines[name].append(f"{name}{_format_labels(labels)} {_format_value(func())}")
+
+        output = []
+        for name in sorted(lines):
+            if name in self._descriptions:
+                type_, help_text = self._descriptions[name]
+                output.append(f"# HELP {name} {help_text}")
+                output.append(f"# TYPE {name} {type_}")
+            output.extend(lines[name])
+        return "\n".join(output) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+metrics = Metrics()
+
+metrics.describe("bot_handler_calls_total", "counter", "Вызовы обработчиков бота")
+metrics.describe("bot_handler_duration_seconds", "histogram", "Время работы обработчиков бота")
+metrics.describe("bot_handler_queries_total", "counter", "SQL-запросы обработчиков бота")
+metrics.describe("bot_messages_sent_total", "counter", "Исходящие сообщения бота")
+metrics.describe("http_requests_total", "counter", "HTTP-запросы к API")
+metrics.describe("http_request_duration_seconds", "histogram", "Время обработки HTTP-запросов")
+metrics.describe("db_pool_checkouts_total", "counter", "Выдачи соединений из пула БД")
+metrics.describe("db_pool_checkout_seconds", "histogram", "Ожидание соединения из пула БД")
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool, измеряющий время ожидания соединения.
+
+    Attributes:
+        shard (str): Метка shard метрик пула (см. register_pool_metrics)
+    """
+
+    shard = "main"
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics.inc("db_pool_checkouts_total", shard=self.shard)
+            metrics.observe("db_pool_checkout_seconds", time.perf_counter() - start, shard=self.shard)
+
+    def recreate(self):
+        # engine.dispose() заменяет пул новым, метка переходит к нему
+        pool = super().recreate()
+        pool.shard = self.shard
+        return pool
+
+
+def register_pool_metrics(engine, shard: str):
+    """
+    Публикует использование пула соединений движка с меткой shard.
+
+    Args:
+        engine (Engine): Движок SQLAlchemy с MeteredQueuePool
+        shard (str): Номер шарда или "main" для основной БД вне шардов
+    """
+    engine.pool.shard = shard
+    # engine.pool пересоздается при engine.dispose(), поэтому читаем его при каждом вызове
+    metrics.gauge("db_pool_size", "Размер пула соединений БД", lambda: engine.pool.size(), shard=shard)
+    metrics.gauge("db_pool_checked_out", "Соединения БД, выданные из пула",
+                  lambda: engine.pool.checkedout(), shard=shard)
+    metrics.gauge("db_pool_overflow", "Соединения БД сверх размера пула",
+                  lambda: engine.pool.overflow(), shard=shard)
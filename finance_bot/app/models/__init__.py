@@ -1,2 +1,4 @@
 from .base import BaseModel
-from .transaction import Category, Transaction
\ No newline at end of file
+from .transaction import Category, Transaction
+from .archive import TransactionArchive, TransactionRollup
+from .idempotency import IdempotencyKey
@@ -0,0 +1,59 @@
+"""
+Модели SQLAlchemy для архива старых транзакций.
+
+Транзакции старше горизонта архивации переносятся из таблицы transactions
+в сжатые блоки по пользователю и месяцу, а суммы по категориям сохраняются
+в отдельной таблице итогов, чтобы статистика не распаковывала архив.
+
+Models:
+    TransactionArchive: Сжатый блок транзакций пользователя за месяц
+    TransactionRollup: Итоги архивных транзакций по категории за месяц
+"""
+
+
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, LargeBinary, UniqueConstraint
+from .base import BaseModel
+
+
+class TransactionArchive(BaseModel):
+    """
+    Архивный блок транзакций одного пользователя за один месяц.
+
+    Attributes:
+        user_id (int): ID пользователя Telegram
+        period (date): Первый день месяца
+        row_count (int): Число транзакций в блоке
+        payload (bytes): Сжатые столбцы транзакций, см. app.archive.pack_rows
+    """
+
+    __tablename__ = "transactions_archive"
+    __table_args__ = (UniqueConstraint("user_id", "period", name="uq_transactions_archive_user_period"),)
+
+    user_id = Column(Integer, index=True, nullable=False)
+    period = Column(Date, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+
+
+class TransactionRollup(BaseModel):
+    """
+    Итоги архивных транзакций пользователя по категории за месяц.
+
+    Attributes:
+        user_id (int): ID пользователя Telegram
+        period (date): Первый день месяца
+        category_id (int): ID категории (внешний ключ)
+        total (float): Сумма транзакций
+        row_count (int): Число транзакций
+    """
+
+    __tablename__ = "transaction_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "period", "category_id", name="uq_transaction_rollups_user_period_category"),
+    )
+
+    user_id = Column(Integer, index=True, nullable=False)
+    period = Column(Date, nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"))
+    total = Column(Float, nullable=False, default=0.0)
+    row_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,40 @@
+"""
+Модель ключей идемпотентности для вставки транзакций.
+
+Повторная доставка обновления Telegram или повтор запроса клиентом
+API несут тот же ключ, и вместо новой транзакции возвращается
+созданная ранее (см. app.idempotency).
+
+Models:
+    IdempotencyKey: Ключ запроса и созданная по нему транзакция
+"""
+
+
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String
+from .base import BaseModel
+
+
+class IdempotencyKey(BaseModel):
+    """
+    Ключ идемпотентности вставки транзакции.
+
+    Внешнего ключа на transactions нет: первичный ключ секционированной
+    таблицы включает created_at (см. app.partitions). Ключи старше
+    IDEMPOTENCY_WINDOW_HOURS удаляются, поэтому таблица остается маленькой.
+
+    Attributes:
+        key (str): Ключ запроса, уникальный (уникальный индекс)
+        user_id (int): ID пользователя Telegram
+        transaction_id (int): ID созданной транзакции
+        transaction_created_at (datetime): Время создания транзакции, ключ ее партиции
+        created_at (datetime): Время создания, по нему удаляются старые ключи (индексированное)
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), unique=True, index=True, nullable=False)
+    user_id = Column(Integer)
+    transaction_id = Column(Integer, nullable=False)
+    transaction_created_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
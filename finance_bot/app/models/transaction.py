@@ -10,7 +10,9 @@ Models:
 """
 
 
-from sqlalchemy import Column, String, Float, ForeignKey, Integer
+from datetime import datetime
+from sqlalchemy import Column, String, Float, ForeignKey, Integer, DateTime, PrimaryKeyConstraint, Sequence
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -48,19 +50,38 @@ class Transaction(BaseModel):
             category_id (int): ID связанной категории (внешний ключ)
             user_id (int): ID пользователя Telegram (индексированное)
             category (Category): Связанная категория
+            id (int): Часть первичного ключа (id, created_at), выдается transactions_id_seq
+            created_at (datetime): Время создания, ключ секционирования, часть первичного ключа
 
         Table Args:
             __tablename__ (str): Имя таблицы в БД
+            postgresql_partition_by: Месячное секционирование по created_at в PostgreSQL
 
         Relationships:
             category: Связь с моделью Category (многие к одному)
         """
 
     __tablename__ = "transactions"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
+    # Первичный ключ (id, created_at), как в миграции 8e1f4a6c2d90: refresh() и
+    # delete() ищут строку по обоим столбцам и попадают в одну партицию.
+    # В составном ключе id не автоинкрементный, поэтому последовательность
+    # указана явно; SQLite ее игнорирует и выдает id как rowid
+    id = Column(Integer, Sequence("transactions_id_seq"), primary_key=True, index=True)
     amount = Column(Float)
     description = Column(String)
     category_id = Column(Integer, ForeignKey("categories.id"))
     user_id = Column(Integer, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
 
-    category = relationship("Category", back_populates="transactions")
\ No newline at end of file
+    category = relationship("Category", back_populates="transactions")
+
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _sqlite_primary_key(constraint, compiler, **kw):
+    # SQLite не секционирует transactions, и миграция оставляет первичным
+    # ключом только id: id выдается автоматически лишь для INTEGER PRIMARY KEY
+    if constraint.table.name == Transaction.__tablename__:
+        return "PRIMARY KEY (id)"
+    return compiler.visit_primary_key_constraint(constraint, **kw)
@@ -0,0 +1,115 @@
+"""
+Обслуживание месячных партиций таблицы transactions.
+
+В PostgreSQL таблица transactions секционирована по диапазону created_at
+(см. миграцию 8e1f4a6c2d90): по одной партиции на месяц и партиция
+по умолчанию для строк вне созданных диапазонов. Модуль заранее создает
+партиции на PARTITION_MONTHS_AHEAD месяцев вперед, чтобы новые транзакции
+не попадали в партицию по умолчанию. Для других СУБД функции ничего не делают.
+
+Functions:
+    partition_name(): Имя партиции для месяца
+    is_partition_table(): Проверка, является ли таблица партицией
+    month_ranges(): Границы месячных партиций
+    ensure_partitions(): Создание недостающих будущих партиций
+"""
+
+
+import logging
+import re
+from datetime import date, datetime
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from .config import settings
+
+logger = logging.getLogger("finance_bot.partitions")
+
+_PARTITION_NAME = re.compile(r"transactions_(y\d{4}m\d{2}|default)")
+
+
+def partition_name(month: date) -> str:
+    return f"transactions_y{month.year}m{month.month:02d}"
+
+
+def is_partition_table(name: str) -> bool:
+    """
+    Является ли таблица партицией transactions.
+
+    Партиции не описаны моделями, поэтому автогенерация миграций их пропускает.
+    """
+    return bool(name) and _PARTITION_NAME.fullmatch(name) is not None
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_ranges(start: date, end: date) -> List[Tuple[str, date, date]]:
+    """
+    Границы месячных партиций от месяца start до месяца end включительно.
+
+    Returns:
+        List[Tuple[str, date, date]]: Имя партиции, начало и конец (не включая) диапазона
+    """
+    month = date(start.year, start.month, 1)
+    ranges = []
+    while month <= end:
+        next_month = add_months(month, 1)
+        ranges.append((partition_name(month), month, next_month))
+        month = next_month
+    return ranges
+
+
+def ensure_partitions(engine: Engine, months_ahead: int = None, now: datetime = None) -> List[str]:
+    """
+    Создает партиции transactions с текущего месяца на months_ahead вперед.
+
+    Args:
+        engine (Engine): Движок SQLAlchemy
+        months_ahead (int): Горизонт в месяцах, по умолчанию PARTITION_MONTHS_AHEAD
+        now (datetime): Текущее время UTC, для тестов
+
+    Returns:
+        List[str]: Имена созданных партиций
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+
+    with engine.connect() as conn:
+        partitioned = conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('transactions')"
+        )).first()
+        if partitioned is None:
+            return []
+        existing = set(conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = 'transactions'::regclass"
+        )).scalars())
+
+    today = (now or datetime.utcnow()).date()
+    created = []
+    for name, start, end in month_ranges(today, add_months(today, months_ahead)):
+        if name in existing:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF transactions "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+        except DBAPIError as e:
+            # Обычно это строки нужного месяца в партиции по умолчанию:
+            # их нужно перенести вручную, прежде чем создавать партицию
+            logger.error("Не удалось создать партицию %s: %s", name, e)
+            continue
+        created.append(name)
+        logger.info("Создана партиция %s", name)
+    return created
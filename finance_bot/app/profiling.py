@@ -0,0 +1,142 @@
+"""
+Профилирование SQL-запросов для Finance Tracker Bot.
+
+Модуль подключается к событиям SQLAlchemy и считает количество SQL-выражений
+и суммарное время их выполнения в рамках одного запроса API или вызова
+обработчика бота. Выражения, выполнявшиеся дольше порога
+SLOW_QUERY_THRESHOLD_MS, записываются в лог медленных запросов.
+
+Attributes:
+    logger (logging.Logger): Логгер со сводкой по обработчикам
+    slow_query_logger (logging.Logger): Лог медленных запросов
+"""
+
+
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .metrics import metrics
+
+logger = logging.getLogger("finance_bot.profiling")
+slow_query_logger = logging.getLogger("finance_bot.slow_query")
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    """
+    Счетчик SQL-выражений одного запроса или обработчика.
+
+    Attributes:
+        name (str): Имя обработчика или маршрута
+        count (int): Количество выполненных SQL-выражений
+        duration (float): Суммарное время выполнения в секундах
+        statements (List[str]): Тексты выполненных выражений
+        parent (Optional[QueryStats]): Внешний счетчик, если блоки вложены
+    """
+
+    __slots__ = ("name", "count", "duration", "statements", "parent")
+
+    def __init__(self, name: str, parent: Optional["QueryStats"] = None):
+        self.name = name
+        self.count = 0
+        self.duration = 0.0
+        self.statements: List[str] = []
+        self.parent = parent
+
+    def record(self, statement: str, duration: float):
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.duration += duration
+            stats.statements.append(statement)
+            stats = stats.parent
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+    if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        slow_query_logger.warning(
+            "Медленный запрос (%.1f мс)%s: %s",
+            duration * 1000,
+            f" в {stats.name}" if stats is not None else "",
+            statement,
+        )
+
+
+@contextmanager
+def track_queries(name: str):
+    """
+    Считает SQL-выражения, выполненные внутри блока.
+
+    Выражения вложенного блока учитываются и во всех внешних блоках.
+
+    Args:
+        name (str): Имя обработчика или маршрута для логов
+
+    Yields:
+        QueryStats: Статистика выполненных выражений
+
+    Example:
+        with track_queries("statistics") as stats:
+            ...
+        print(stats.count, stats.duration)
+    """
+    stats = QueryStats(name, parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        logger.debug("%s: %d SQL-запросов, %.1f мс", name, stats.count, stats.duration * 1000)
+
+
+def profile_handler(func):
+    """
+    Декоратор обработчика бота, считающий его SQL-запросы.
+
+    Также публикует число вызовов, время работы и число SQL-запросов
+    обработчика в метриках приложения.
+
+    Args:
+        func: Асинхронный обработчик Pyrogram
+
+    Returns:
+        Обернутый обработчик с тем же именем и сигнатурой
+    """
+    handler = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        status = "error"
+        start = time.perf_counter()
+        with track_queries(handler) as stats:
+            try:
+                result = await func(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                metrics.observe("bot_handler_duration_seconds", time.perf_counter() - start, handler=handler)
+                metrics.inc("bot_handler_calls_total", handler=handler, status=status)
+                metrics.inc("bot_handler_queries_total", stats.count, handler=handler)
+
+    return wrapper
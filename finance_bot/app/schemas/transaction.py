@@ -10,13 +10,13 @@ class TransactionBase(BaseModel):
 
 
 class TransactionCreate(TransactionBase):
-    pass
+    user_id: Optional[int] = None
 
 
 class Transaction(TransactionBase):
     id: int
     created_at: datetime
-    user_id: int
+    user_id: Optional[int] = None
 
     class Config:
         orm_mode = True
\ No newline at end of file
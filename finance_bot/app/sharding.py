@@ -0,0 +1,102 @@
+"""
+Шардирование данных пользователей по user_id.
+
+Если в настройках задан SHARD_DATABASE_URLS, транзакции, архив и итоги
+каждого пользователя хранятся в одной из перечисленных БД. Шард выбирается
+jump consistent hash от user_id: результат не зависит от процесса, а при
+добавлении шарда переезжает только 1/N пользователей. Каждый шард содержит
+полную схему (миграции применяются к каждому, см. alembic/env.py), а
+справочник категорий копируется во все шарды (см. app.init_db).
+
+Операции одного пользователя открывают сессию только его шарда. Запросы
+по всем пользователям выполняются на всех шардах параллельно в пуле
+потоков, а результаты объединяются.
+
+Classes:
+    ShardRouter: Выбор шарда и параллельный обход шардов
+
+Functions:
+    jump_hash(): Jump consistent hash (Lamping, Veach, 2014)
+"""
+
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, TypeVar
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+T = TypeVar("T")
+
+_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Номер корзины для ключа по алгоритму jump consistent hash.
+
+    Args:
+        key (int): Ключ, например ID пользователя Telegram
+        buckets (int): Число корзин
+
+    Returns:
+        int: Номер корзины от 0 до buckets - 1
+    """
+    key &= _MASK
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & _MASK
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class ShardRouter:
+    """
+    Маршрутизация сессий БД по шардам.
+
+    Attributes:
+        engines (List[Engine]): Движки шардов в порядке SHARD_DATABASE_URLS
+        sessionmakers (List[sessionmaker]): Фабрики сессий шардов
+        enabled (bool): Включено ли шардирование
+    """
+
+    def __init__(self, engines: List[Engine], enabled: bool = True):
+        self.engines = engines
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=engine) for engine in engines
+        ]
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix="shard")
+
+    def shard_for(self, user_id: int) -> int:
+        # Строки без пользователя (создание через API без user_id) живут в шарде 0
+        return jump_hash(user_id or 0, len(self.engines))
+
+    def session_for(self, user_id: int) -> Session:
+        """
+        Сессия шарда, в котором хранятся данные пользователя.
+        """
+        return self.sessionmakers[self.shard_for(user_id)]()
+
+    def fan_out(self, func: Callable[[Session], T]) -> List[T]:
+        """
+        Выполняет func на каждом шарде параллельно.
+
+        Каждому вызову выдается собственная сессия шарда, которая
+        закрывается после выполнения.
+
+        Args:
+            func (Callable[[Session], T]): Запрос к одному шарду
+
+        Returns:
+            List[T]: Результаты в порядке шардов
+        """
+        def run(factory):
+            db = factory()
+            try:
+                return func(db)
+            finally:
+                db.close()
+
+        return list(self._executor.map(run, self.sessionmakers))
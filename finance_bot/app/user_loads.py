@@ -0,0 +1,98 @@
+"""
+Согласование загрузки кэшей пользователя с его вставками.
+
+Кэши в памяти (app.ledger_cache, app.autocomplete) загружают данные
+пользователя из БД вне блокировки, а новые транзакции дописывают после
+фиксации. Загрузка, пересекшаяся по времени с записью того же пользователя
+(от начала вставки до обновления кэша), может уже содержать новую строку,
+а может и нет: дописать строку в такой результат значит, возможно,
+учесть ее дважды, а не дописать - возможно, потерять. Поэтому такая
+загрузка возвращается вызывающему, но не кэшируется.
+
+Classes:
+    UserLoads: Учет незавершенных загрузок и записей пользователей
+"""
+
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+
+class _Loading:
+    """
+    Незавершенная загрузка данных пользователя.
+
+    Attributes:
+        loaders (int): Число потоков, читающих данные из БД
+        stale (bool): Загрузка пересеклась с записью пользователя
+    """
+
+    __slots__ = ("loaders", "stale")
+
+    def __init__(self):
+        self.loaders = 0
+        self.stale = False
+
+
+class UserLoads:
+    """
+    Незавершенные загрузки и записи пользователей одного кэша.
+
+    begin() и end() вызываются под блокировкой кэша lock, writing()
+    берет ее сам.
+
+    Example:
+        with self._lock:
+            loading = self._loads.begin(user_id)
+        data = load(db, user_id)
+        with self._lock:
+            if self._loads.end(user_id, loading):
+                cache[user_id] = data
+    """
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self._loading: Dict[int, _Loading] = {}
+        self._writers: Dict[int, int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return len(self._loading)
+
+    def begin(self, user_id: int) -> _Loading:
+        loading = self._loading.setdefault(user_id, _Loading())
+        loading.loaders += 1
+        if self._writers.get(user_id):
+            loading.stale = True
+        return loading
+
+    def end(self, user_id: int, loading: _Loading) -> bool:
+        """
+        Завершает загрузку.
+
+        Returns:
+            bool: Можно ли кэшировать результат загрузки
+        """
+        loading.loaders -= 1
+        if not loading.loaders:
+            del self._loading[user_id]
+        return not loading.stale
+
+    @contextmanager
+    def writing(self, user_id: int):
+        """
+        Отмечает запись пользователя: от начала вставки до обновления кэша.
+        """
+        with self._lock:
+            self._writers[user_id] += 1
+            loading = self._loading.get(user_id)
+            if loading is not None:
+                loading.stale = True
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._writers[user_id] -= 1
+                if not self._writers[user_id]:
+                    del self._writers[user_id]
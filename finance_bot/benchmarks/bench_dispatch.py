@@ -0,0 +1,103 @@
+"""
+Микробенчмарк выбора обработчика для входящего сообщения.
+
+Сравнивает маршрутизатор app.bot.router с прежней цепочкой фильтров
+Pyrogram (команды и filters.regex в порядке регистрации, последним -
+обработчик ввода с негативным регулярным выражением, который вызывался
+для любого текста и сам проверял user_states). Для каждого вида сообщений
+выводится стоимость выбора обработчика в микросекундах на сообщение;
+сами обработчики, кроме прежнего обработчика ввода, не вызываются.
+
+Запуск из каталога finance_bot:
+    python -m benchmarks.bench_dispatch --iterations 20000
+
+Functions:
+    bench_router(): Стоимость выбора обработчика маршрутизатором
+    bench_legacy(): Стоимость выбора обработчика цепочкой фильтров
+    main(): Точка входа командной строки
+"""
+
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+from pyrogram import enums, filters, types
+
+import run
+
+USER_ID = 900_000_001
+IDLE_USER_ID = 900_000_002
+
+LEGACY_FILTERS = [
+    (filters.command("start"), None),
+    (filters.command("help"), None),
+    (filters.regex("^📊 Статистика$") | filters.command("statistics"), None),
+    (filters.regex("^📋 Категории$") | filters.command("categories"), None),
+    (filters.regex("^💸 Добавить расход$"), None),
+    (filters.regex("^💰 Добавить доход$"), None),
+    (filters.text & filters.regex("^(?!📊|📋|💰|💸|/).+"), run.handle_transaction_input),
+]
+
+
+def make_message(text: str, user_id: int) -> types.Message:
+    user = types.User(id=user_id, is_bot=False, first_name="Bench")
+    return types.Message(id=1, text=text, from_user=user,
+                         chat=types.Chat(id=user_id, type=enums.ChatType.PRIVATE))
+
+
+def sample_messages() -> Dict[str, types.Message]:
+    return {
+        "button": make_message("💸 Добавить расход", USER_ID),
+        "command": make_message("/statistics month", USER_ID),
+        "dialog_text": make_message("350 такси", USER_ID),
+        "unrelated_text": make_message("привет", IDLE_USER_ID),
+        "unknown_command": make_message("/settings", IDLE_USER_ID),
+    }
+
+
+def bench_router(message: types.Message, username: str, iterations: int) -> float:
+    resolve = run.router.resolve
+    start = time.perf_counter()
+    for _ in range(iterations):
+        resolve(message, username)
+    return (time.perf_counter() - start) / iterations
+
+
+async def bench_legacy(client, message: types.Message, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for flt, handler in LEGACY_FILTERS:
+            if await flt(client, message):
+                if handler is not None:
+                    # Прежний обработчик ввода вызывался для любого текста
+                    # и сам отбрасывал пользователей без состояния
+                    if message.from_user.id not in run.user_states:
+                        await handler(client, message)
+                break
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк выбора обработчика сообщения")
+    parser.add_argument("--iterations", type=int, default=20000, help="повторов на вид сообщения")
+    args = parser.parse_args()
+
+    client = SimpleNamespace(me=types.User(id=1, is_bot=True, first_name="Finance", username="finance_bot"))
+    run.user_states[USER_ID] = {'category_id': 1, 'type': 'expense'}
+
+    results: List[tuple] = []
+    for kind, message in sample_messages().items():
+        router_cost = bench_router(message, client.me.username, args.iterations)
+        legacy_cost = asyncio.run(bench_legacy(client, message, args.iterations))
+        results.append((kind, router_cost, legacy_cost))
+
+    print(f"{'message':<16} {'router, мкс':>12} {'regex, мкс':>12} {'ускорение':>10}")
+    for kind, router_cost, legacy_cost in results:
+        print(f"{kind:<16} {router_cost * 1e6:>12.2f} {legacy_cost * 1e6:>12.2f} {legacy_cost / router_cost:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Бенчмарк основных операций Finance Tracker Bot.
+
+Загружает синтетический журнал нескольких размеров в БД из DATABASE_URL и
+замеряет статистику, список и создание транзакций через API, построение
+клавиатуры категорий и вставку транзакции из бота. Для каждой операции
+выводятся пропускная способность и перцентили p50/p99, результаты
+сохраняются в JSON для сравнения между коммитами.
+
+Запуск из каталога finance_bot на отдельной локальной БД:
+    python -m benchmarks.bench_ledger --users 100 --per-user 10,100,1000
+    python -m benchmarks.bench_ledger --compare benchmarks/results/<файл>.json
+
+Functions:
+    run_benchmarks(): Прогон всех операций для всех размеров журнала
+    main(): Точка входа командной строки
+"""
+
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy import delete
+
+import run
+from app.api.endpoints.transactions import create_transaction, get_transactions
+from app.database import SessionLocal, engine
+from app.models.transaction import Transaction
+from app.schemas.transaction import TransactionCreate
+from benchmarks.generator import (
+    DEFAULT_DISTRIBUTION, LedgerSpec, category_ids_by_type, clear_ledger, load_ledger,
+    max_transaction_id,
+)
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    Перцентиль по методу ближайшего ранга.
+
+    Args:
+        samples (List[float]): Отсортированные замеры
+        q (float): Перцентиль от 0 до 100
+    """
+    index = max(0, min(len(samples) - 1, round(q / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+def summarize(operation: str, size: int, samples: List[float]) -> dict:
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        "operation": operation,
+        "size": size,
+        "iterations": len(samples),
+        "ops_per_sec": round(len(samples) / total, 1) if total else None,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def measure(func: Callable[[], None], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def measure_async(func, iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def make_message(user_id: int, text: str = ""):
+    message = MagicMock()
+    message.reply_text = AsyncMock()
+    message.from_user.id = user_id
+    message.text = text
+    return message
+
+
+def bench_operations(spec: LedgerSpec, iterations: int, rng: random.Random) -> Dict[str, List[float]]:
+    """
+    Замеряет операции на уже загруженном журнале.
+
+    Returns:
+        Dict[str, List[float]]: Замеры в секундах по имени операции
+    """
+    client = MagicMock()
+    db = SessionLocal()
+    categories = category_ids_by_type(db)
+    db.close()
+    expense_ids = categories["expense"]
+    users = list(spec.user_ids)
+
+    async def statistics():
+        await run.statistics(client, make_message(rng.choice(users)))
+
+    async def bot_insert():
+        user_id = rng.choice(users)
+        run.user_states[user_id] = {'category_id': rng.choice(expense_ids), 'type': 'expense'}
+        await run.handle_transaction_input(client, make_message(user_id, "350 такси"))
+
+    def list_transactions():
+        db = SessionLocal()
+        try:
+            get_transactions(db=db)
+        finally:
+            db.close()
+
+    def api_create():
+        db = SessionLocal()
+        try:
+            data = TransactionCreate(amount=500, description="Продукты", category_id=rng.choice(expense_ids))
+            create_transaction(data, db)
+        finally:
+            db.close()
+
+    return {
+        "statistics": asyncio.run(measure_async(statistics, iterations)),
+        "get_transactions": measure(list_transactions, iterations),
+        "create_transaction": measure(api_create, iterations),
+        "get_categories_keyboard": measure(lambda: run.get_categories_keyboard("expense"), iterations),
+        "bot_insert": asyncio.run(measure_async(bot_insert, iterations)),
+    }
+
+
+def run_benchmarks(users: int, sizes: List[int], distribution: Dict[str, float],
+                   iterations: int, seed: int) -> dict:
+    """
+    Прогоняет бенчмарк для каждого размера журнала.
+
+    Args:
+        users (int): Число синтетических пользователей
+        sizes (List[int]): Варианты числа транзакций на пользователя
+        distribution (Dict[str, float]): Доли категорий
+        iterations (int): Число замеров каждой операции
+        seed (int): Зерно генератора данных и выбора пользователей
+
+    Returns:
+        dict: Метаданные прогона и результаты по операциям
+    """
+    results = []
+    db = SessionLocal()
+    first_api_id = max_transaction_id(db) + 1
+    try:
+        for per_user in sizes:
+            spec = LedgerSpec(users=users, transactions_per_user=per_user,
+                              distribution=distribution, seed=seed)
+            start = time.perf_counter()
+            loaded = load_ledger(db, spec)
+            print(f"Загружено {loaded} транзакций за {time.perf_counter() - start:.1f} с")
+
+            samples = bench_operations(spec, iterations, random.Random(seed))
+            for operation, values in samples.items():
+                result = summarize(operation, spec.total, values)
+                results.append(result)
+                print(f"{spec.total:>10} {operation:<25} {result['ops_per_sec']:>10} оп/с "
+                      f"p50 {result['p50_ms']:>9} мс  p99 {result['p99_ms']:>9} мс")
+    finally:
+        # create_transaction не заполняет user_id, поэтому удаляем его строки по id
+        db.execute(delete(Transaction).where(Transaction.id >= first_api_id, Transaction.user_id.is_(None)))
+        clear_ledger(db)
+        db.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "database": engine.dialect.name,
+        "users": users,
+        "iterations": iterations,
+        "results": results,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict):
+    """
+    Печатает изменение p50 и пропускной способности относительно прошлого прогона.
+    """
+    previous = {(r["operation"], r["size"]): r for r in baseline["results"]}
+    print(f"\nСравнение с {baseline['commit']} ({baseline['timestamp']}):")
+    for result in current["results"]:
+        old = previous.get((result["operation"], result["size"]))
+        if old is None or not old["p50_ms"]:
+            continue
+        change = (result["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+        print(f"{result['size']:>10} {result['operation']:<25} p50 {old['p50_ms']:>9} -> "
+              f"{result['p50_ms']:>9} мс ({change:+.1f}%)")
+
+
+def parse_distribution(value: str) -> Dict[str, float]:
+    distribution = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        distribution[name.strip()] = float(weight)
+    return distribution
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк Finance Tracker Bot")
+    parser.add_argument("--users", type=int, default=100, help="число синтетических пользователей")
+    parser.add_argument("--per-user", default="10,100,1000",
+                        help="варианты числа транзакций на пользователя через запятую")
+    parser.add_argument("--distribution", type=parse_distribution, default=DEFAULT_DISTRIBUTION,
+                        help="доли категорий, например 'Продукты=0.7,Транспорт=0.3'")
+    parser.add_argument("--iterations", type=int, default=100, help="замеров на операцию")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", type=Path, help="файл прошлого прогона для сравнения")
+    parser.add_argument("--out", type=Path, default=RESULTS_DIR, help="каталог для результатов")
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        args.users, [int(size) for size in args.per_user.split(",")],
+        args.distribution, args.iterations, args.seed,
+    )
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    path = args.out / f"{report['timestamp'].replace(':', '')}_{report['commit']}.json"
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"\nРезультаты сохранены в {path}")
+
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
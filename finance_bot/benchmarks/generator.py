@@ -0,0 +1,166 @@
+"""
+Генератор синтетического журнала транзакций для бенчмарков.
+
+Создает детерминированный набор транзакций для заданного числа пользователей
+и загружает его в БД пакетными INSERT. Синтетические пользователи получают
+ID начиная с FIRST_USER_ID, чтобы их можно было удалить, не затрагивая
+реальные данные.
+
+Attributes:
+    FIRST_USER_ID (int): ID первого синтетического пользователя
+    DEFAULT_DISTRIBUTION (Dict[str, float]): Доли категорий по умолчанию
+    DESCRIPTIONS (Dict[str, List[str]]): Описания транзакций по категориям
+"""
+
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.init_db import init_categories
+from app.models.idempotency import IdempotencyKey
+from app.models.transaction import Category, Transaction
+
+FIRST_USER_ID = 900_000_000
+
+DEFAULT_DISTRIBUTION = {
+    "Продукты": 0.35,
+    "Транспорт": 0.2,
+    "Развлечения": 0.1,
+    "Коммунальные услуги": 0.08,
+    "Здоровье": 0.07,
+    "Зарплата": 0.1,
+    "Фриланс": 0.05,
+    "Подарки": 0.03,
+    "Инвестиции": 0.02,
+}
+
+DESCRIPTIONS = {
+    "Продукты": ["Пятёрочка", "Перекрёсток", "Магнит", "ВкусВилл", "рынок"],
+    "Транспорт": ["такси", "метро", "бензин", "каршеринг"],
+    "Развлечения": ["кино", "кафе", "концерт", "подписка"],
+    "Коммунальные услуги": ["свет", "вода", "интернет", "квартплата"],
+    "Здоровье": ["аптека", "стоматолог", "анализы"],
+    "Зарплата": ["аванс", "зарплата"],
+    "Фриланс": ["заказ", "консультация"],
+    "Подарки": ["день рождения", "подарок"],
+    "Инвестиции": ["дивиденды", "купоны"],
+}
+
+
+@dataclass
+class LedgerSpec:
+    """
+    Параметры синтетического журнала.
+
+    Attributes:
+        users (int): Число пользователей
+        transactions_per_user (int): Транзакций на пользователя
+        distribution (Dict[str, float]): Доли категорий по названию
+        days (int): Глубина истории в днях от текущего момента
+        seed (int): Зерно генератора случайных чисел
+    """
+
+    users: int = 100
+    transactions_per_user: int = 100
+    distribution: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_DISTRIBUTION))
+    days: int = 365
+    seed: int = 42
+
+    @property
+    def total(self) -> int:
+        return self.users * self.transactions_per_user
+
+    @property
+    def user_ids(self) -> range:
+        return range(FIRST_USER_ID, FIRST_USER_ID + self.users)
+
+
+def generate_transactions(spec: LedgerSpec, category_ids: Dict[str, int],
+                          now: datetime = None) -> Iterator[dict]:
+    """
+    Генерирует строки таблицы transactions.
+
+    Args:
+        spec (LedgerSpec): Параметры журнала
+        category_ids (Dict[str, int]): ID категорий по названию
+        now (datetime): Конец периода истории, по умолчанию текущее время UTC
+
+    Yields:
+        dict: Значения столбцов одной транзакции
+    """
+    rng = random.Random(spec.seed)
+    now = now or datetime.utcnow()
+    names = [name for name in spec.distribution if name in category_ids]
+    weights = [spec.distribution[name] for name in names]
+    horizon = spec.days * 86400
+
+    for user_id in spec.user_ids:
+        for name in rng.choices(names, weights, k=spec.transactions_per_user):
+            created_at = now - timedelta(seconds=rng.randrange(horizon))
+            yield {
+                "amount": round(rng.lognormvariate(6.5, 1.0), 2),
+                "description": rng.choice(DESCRIPTIONS.get(name, [name])),
+                "category_id": category_ids[name],
+                "user_id": user_id,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+
+
+def load_ledger(db: Session, spec: LedgerSpec, batch_size: int = 5000) -> int:
+    """
+    Загружает синтетический журнал в БД, предварительно удалив старый.
+
+    Args:
+        db (Session): Сессия базы данных
+        spec (LedgerSpec): Параметры журнала
+        batch_size (int): Число строк в одном пакетном INSERT
+
+    Returns:
+        int: Число загруженных транзакций
+    """
+    init_categories()
+    clear_ledger(db)
+    category_ids = dict(db.execute(select(Category.name, Category.id)).all())
+
+    batch = []
+    loaded = 0
+    for row in generate_transactions(spec, category_ids):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.execute(insert(Transaction), batch)
+            loaded += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(Transaction), batch)
+        loaded += len(batch)
+    db.commit()
+    return loaded
+
+
+def clear_ledger(db: Session):
+    """
+    Удаляет транзакции синтетических пользователей и их ключи идемпотентности.
+    """
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id >= FIRST_USER_ID))
+    db.execute(delete(Transaction).where(Transaction.user_id >= FIRST_USER_ID))
+    db.commit()
+
+
+def max_transaction_id(db: Session) -> int:
+    return db.execute(select(func.coalesce(func.max(Transaction.id), 0))).scalar_one()
+
+
+def category_ids_by_type(db: Session) -> Dict[str, List[int]]:
+    """
+    ID категорий, сгруппированные по типу ("expense" или "income").
+    """
+    result: Dict[str, List[int]] = {}
+    for category_id, type_ in db.execute(select(Category.id, Category.type)):
+        result.setdefault(type_, []).append(category_id)
+    return result
@@ -0,0 +1,412 @@
+"""
+Нагрузочный стенд Telegram-бота без обращения к Telegram.
+
+Виртуальные пользователи проходят реальные сценарии (кнопка добавления
+расхода или дохода, выбор категории в handle_callback, ввод суммы в
+handle_transaction_input, просмотр статистики). Обновления проходят через
+обработчики, зарегистрированные в run.py, с теми же фильтрами и порядком
+групп, что и в диспетчере Pyrogram. Сетевые вызовы заменены FakeClient.
+
+Все пользователи работают конкурентно в одном цикле событий, а обновления
+разбирает пул воркеров, как в Pyrogram. Стенд измеряет задержку от
+постановки обновления в очередь до завершения обработчика, долю ошибок и
+загрузку пула соединений БД.
+
+Обработчики обращаются к БД синхронно в цикле событий, поэтому занятость
+пулов основной БД и шардов опрашивается из отдельного потока (PoolSampler),
+а ожидание соединения берется из гистограммы db_pool_checkout_seconds,
+которую пишет MeteredQueuePool.
+
+Запуск из каталога finance_bot на отдельной локальной БД:
+    python -m benchmarks.load_bot --users 2000 --flows 3 --workers 8
+
+Functions:
+    run_load(): Прогон нагрузки в текущем цикле событий
+    main(): Точка входа командной строки
+"""
+
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+from pyrogram import enums, types
+from pyrogram.handlers import CallbackQueryHandler, MessageHandler
+
+import run
+from app.database import SessionLocal, engine, shards
+from app.metrics import metrics
+from benchmarks.bench_ledger import percentile
+from benchmarks.generator import DESCRIPTIONS, LedgerSpec, category_ids_by_type, clear_ledger, load_ledger
+
+ERROR_REPLIES = ("Ошибка", "Произошла ошибка", "Неверный формат")
+CHECKOUT_HISTOGRAM = "db_pool_checkout_seconds"
+
+
+class FakeClient:
+    """
+    Замена сетевой части Pyrogram Client.
+
+    Принимает исходящие сообщения вместо Telegram и имитирует задержку сети.
+
+    Attributes:
+        me (types.User): Пользователь бота, нужен фильтру filters.command
+        latency (float): Имитируемая задержка отправки сообщения, в секундах
+        sent (int): Число отправленных сообщений
+        error_replies (int): Число ответов с сообщением об ошибке
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.me = types.User(id=1, is_bot=True, first_name="Finance", username="finance_bot")
+        self.latency = latency
+        self.sent = 0
+        self.error_replies = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+        if text.lstrip().startswith(ERROR_REPLIES):
+            self.error_replies += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+@dataclass
+class LoadConfig:
+    """
+    Параметры нагрузки.
+
+    Attributes:
+        users (int): Число виртуальных пользователей
+        flows (int): Сценариев добавления транзакции на пользователя
+        workers (int): Число воркеров, разбирающих обновления
+        think_time (float): Средняя пауза пользователя между действиями, в секундах
+        network_latency (float): Задержка отправки сообщения в Telegram, в секундах
+        statistics_ratio (float): Доля сценариев, завершающихся просмотром статистики
+        income_ratio (float): Доля сценариев добавления дохода
+        history (int): Транзакций на пользователя, загружаемых до начала нагрузки
+        seed (int): Зерно генератора случайных чисел
+    """
+
+    users: int = 1000
+    flows: int = 3
+    workers: int = 8
+    think_time: float = 0.5
+    network_latency: float = 0.02
+    statistics_ratio: float = 0.3
+    income_ratio: float = 0.2
+    history: int = 0
+    seed: int = 42
+
+
+class LoadStats:
+    """
+    Результаты прогона: задержки по обработчикам, ошибки и загрузка пула БД.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.unhandled = 0
+        self.pool_samples: List[int] = []
+        self.checkout_counts: List[float] = []
+
+    def report(self, client: FakeClient, elapsed: float, config: LoadConfig) -> dict:
+        handlers = {}
+        for name, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            handlers[name] = {
+                "calls": len(samples),
+                "errors": self.errors[name],
+                "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                "p95_ms": round(percentile(samples, 95) * 1000, 3),
+                "p99_ms": round(percentile(samples, 99) * 1000, 3),
+                "max_ms": round(samples[-1] * 1000, 3),
+            }
+
+        updates = sum(len(samples) for samples in self.latencies.values()) + self.unhandled
+        errors = sum(self.errors.values()) + client.error_replies
+        pool_size = sum(pool_engine.pool.size() for pool_engine in pool_engines())
+        samples = self.pool_samples or [0]
+        checkouts = self.checkout_counts[-1] if self.checkout_counts else 0
+        return {
+            "config": config.__dict__,
+            "elapsed_sec": round(elapsed, 3),
+            "updates": updates,
+            "updates_per_sec": round(updates / elapsed, 1) if elapsed else None,
+            "unhandled_updates": self.unhandled,
+            "errors": errors,
+            "error_rate": round(errors / updates, 4) if updates else 0.0,
+            "messages_sent": client.sent,
+            "handlers": handlers,
+            "db_pool": {
+                "size": pool_size,
+                "max_checked_out": max(samples),
+                "mean_checked_out": round(sum(samples) / len(samples), 2),
+                "saturated_share": round(sum(1 for s in samples if s >= pool_size) / len(samples), 4),
+                "checkouts": int(checkouts),
+                "checkout_wait_mean_ms": round(self.checkout_counts[-2] / checkouts * 1000, 3) if checkouts else 0.0,
+                "checkout_wait_p99_ms": bucket_percentile(self.checkout_counts, 99) * 1000 if checkouts else 0.0,
+            },
+        }
+
+
+def bucket_percentile(counts: List[float], q: float) -> float:
+    """
+    Верхняя граница корзины гистограммы, в которую попадает перцентиль q.
+
+    Args:
+        counts (List[float]): Счетчики корзин, сумма и количество, как в app.metrics
+        q (float): Перцентиль от 0 до 100
+    """
+    rank = counts[-1] * q / 100
+    cumulative = 0
+    for bound, count in zip(metrics.buckets + (float("inf"),), counts):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return float("inf")
+
+
+def checkout_histogram() -> List[float]:
+    _, histograms = metrics.collect()
+    total = [0] * (len(metrics.buckets) + 3)
+    # Пулы основной БД и шардов пишут серии с разными метками shard
+    for (name, _), counts in histograms.items():
+        if name == CHECKOUT_HISTOGRAM:
+            total = [a + b for a, b in zip(total, counts)]
+    return total
+
+
+def pool_engines() -> list:
+    return list({id(pool_engine): pool_engine for pool_engine in [engine, *shards.engines]}.values())
+
+
+class PoolSampler(threading.Thread):
+    """
+    Опрос числа выданных соединений пула из отдельного потока.
+
+    Драйверы БД отпускают GIL на время запроса, поэтому поток видит
+    соединения, занятые синхронными вызовами в цикле событий бота.
+    """
+
+    def __init__(self, samples: List[int], interval: float = 0.001):
+        super().__init__(name="pool-sampler", daemon=True)
+        self.samples = samples
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.samples.append(sum(pool_engine.pool.checkedout() for pool_engine in pool_engines()))
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class BotLoad:
+    """
+    Прогон нагрузки на зарегистрированные обработчики бота.
+    """
+
+    def __init__(self, config: LoadConfig, client: FakeClient):
+        self.config = config
+        self.client = client
+        self.stats = LoadStats()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.ids = itertools.count(1)
+        self.chat_type = enums.ChatType.PRIVATE
+
+    def text_message(self, user: types.User, text: str) -> types.Message:
+        return types.Message(
+            id=next(self.ids), from_user=user, text=text, client=self.client,
+            chat=types.Chat(id=user.id, type=self.chat_type, client=self.client),
+        )
+
+    def callback_query(self, user: types.User, data: str) -> types.CallbackQuery:
+        return types.CallbackQuery(
+            id=str(next(self.ids)), from_user=user, chat_instance=str(user.id), data=data,
+            message=self.text_message(self.client.me, "Выберите категорию:"), client=self.client,
+        )
+
+    async def dispatch(self, update, enqueued_at: float):
+        """
+        Передает обновление обработчикам так же, как диспетчер Pyrogram:
+        в каждой группе срабатывает первый обработчик с подходящим фильтром,
+        а его исключение учитывается как ошибка и не прерывает обработку.
+        """
+        handler_type = CallbackQueryHandler if isinstance(update, types.CallbackQuery) else MessageHandler
+        handled = False
+        for group in run.bot.dispatcher.groups.values():
+            for handler in group:
+                if not isinstance(handler, handler_type) or not await handler.check(self.client, update):
+                    continue
+                name = handler.callback.__name__
+                if handler.callback is run.route_message:
+                    # Текст проходит через маршрутизатор: учитываем выбранную им функцию
+                    target = run.router.resolve(update, self.client.me.username)
+                    if target is None:
+                        break
+                    name = target.__name__
+                try:
+                    await handler.callback(self.client, update)
+                except Exception:
+                    self.stats.errors[name] += 1
+                self.stats.latencies[name].append(time.perf_counter() - enqueued_at)
+                handled = True
+                break
+        if not handled:
+            self.stats.unhandled += 1
+
+    async def worker(self):
+        while True:
+            update, enqueued_at, done = await self.queue.get()
+            try:
+                await self.dispatch(update, enqueued_at)
+            finally:
+                done.set_result(None)
+
+    async def send(self, update):
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((update, time.perf_counter(), done))
+        await done
+
+    async def think(self, rng: random.Random):
+        if self.config.think_time:
+            await asyncio.sleep(rng.expovariate(1 / self.config.think_time))
+
+    async def virtual_user(self, user_id: int, categories: Dict[str, List[int]]):
+        rng = random.Random(self.config.seed + user_id)
+        user = types.User(id=user_id, first_name=f"user{user_id}")
+
+        for _ in range(self.config.flows):
+            type_ = "income" if rng.random() < self.config.income_ratio else "expense"
+            button = "💰 Добавить доход" if type_ == "income" else "💸 Добавить расход"
+            await self.think(rng)
+            await self.send(self.text_message(user, button))
+
+            category_id = rng.choice(categories[type_])
+            await self.think(rng)
+            await self.send(self.callback_query(user, f"cat_{type_}_{category_id}"))
+
+            description = rng.choice(list(itertools.chain(*DESCRIPTIONS.values())))
+            await self.think(rng)
+            await self.send(self.text_message(user, f"{rng.randint(50, 5000)} {description}"))
+
+            if rng.random() < self.config.statistics_ratio:
+                await self.think(rng)
+                await self.send(self.text_message(user, "📊 Статистика"))
+
+
+async def run_load(config: LoadConfig, client: FakeClient = None) -> dict:
+    """
+    Прогоняет нагрузку в текущем цикле событий.
+
+    Цикл должен быть циклом бота (run.bot.loop): Pyrogram регистрирует
+    обработчики задачами в этом цикле.
+
+    Args:
+        config (LoadConfig): Параметры нагрузки
+        client (FakeClient): Клиент для перехвата исходящих сообщений
+
+    Returns:
+        dict: Отчет о задержках, ошибках и загрузке пула БД
+    """
+    # Даем выполниться задачам регистрации обработчиков из декораторов run.py
+    await asyncio.sleep(0)
+    if not run.bot.dispatcher.groups:
+        raise RuntimeError("Обработчики бота не зарегистрированы: запускайте стенд в run.bot.loop")
+
+    client = client or FakeClient(config.network_latency)
+    spec = LedgerSpec(users=config.users, transactions_per_user=config.history, seed=config.seed)
+    db = SessionLocal()
+    try:
+        load_ledger(db, spec)
+        categories = category_ids_by_type(db)
+    finally:
+        db.close()
+
+    load = BotLoad(config, client)
+    background = [asyncio.create_task(load.worker()) for _ in range(config.workers)]
+    sampler = PoolSampler(load.stats.pool_samples)
+    checkouts_before = checkout_histogram()
+    sampler.start()
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(load.virtual_user(user_id, categories) for user_id in spec.user_ids))
+    finally:
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        load.stats.checkout_counts = [
+            after - before for before, after in zip(checkouts_before, checkout_histogram())
+        ]
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        for user_id in spec.user_ids:
+            run.user_states.pop(user_id, None)
+        db = SessionLocal()
+        try:
+            clear_ledger(db)
+        finally:
+            db.close()
+
+    return load.stats.report(client, elapsed, config)
+
+
+def print_report(report: dict):
+    print(f"Обновлений: {report['updates']} за {report['elapsed_sec']} с "
+          f"({report['updates_per_sec']} в секунду), ошибок: {report['errors']} "
+          f"({report['error_rate'] * 100:.2f}%), без обработчика: {report['unhandled_updates']}")
+    print(f"{'обработчик':<28}{'вызовы':>8}{'ошибки':>8}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'max мс':>10}")
+    for name, row in report["handlers"].items():
+        print(f"{name:<28}{row['calls']:>8}{row['errors']:>8}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    pool = report["db_pool"]
+    print(f"Пул БД: размер {pool['size']}, максимум занято {pool['max_checked_out']}, "
+          f"в среднем {pool['mean_checked_out']}, доля времени в насыщении {pool['saturated_share']}")
+    print(f"Выдач соединений: {pool['checkouts']}, ожидание в среднем {pool['checkout_wait_mean_ms']} мс, "
+          f"p99 не более {pool['checkout_wait_p99_ms']} мс")
+
+
+def main():
+    defaults = LoadConfig()
+    parser = argparse.ArgumentParser(description="Нагрузочный стенд Telegram-бота")
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--flows", type=int, default=defaults.flows, help="сценариев на пользователя")
+    parser.add_argument("--workers", type=int, default=defaults.workers, help="воркеров диспетчера")
+    parser.add_argument("--think-time", type=float, default=defaults.think_time,
+                        help="средняя пауза пользователя, с")
+    parser.add_argument("--network-latency", type=float, default=defaults.network_latency,
+                        help="задержка отправки сообщения, с")
+    parser.add_argument("--statistics-ratio", type=float, default=defaults.statistics_ratio)
+    parser.add_argument("--income-ratio", type=float, default=defaults.income_ratio)
+    parser.add_argument("--history", type=int, default=defaults.history,
+                        help="транзакций на пользователя до начала нагрузки")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--out", type=Path, help="файл для сохранения отчета в JSON")
+    args = parser.parse_args()
+
+    config = LoadConfig(
+        users=args.users, flows=args.flows, workers=args.workers, think_time=args.think_time,
+        network_latency=args.network_latency, statistics_ratio=args.statistics_ratio,
+        income_ratio=args.income_ratio, history=args.history, seed=args.seed,
+    )
+    report = run.bot.loop.run_until_complete(run_load(config))
+    print_report(report)
+
+    if args.out:
+        args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,21 +12,63 @@ Attributes:
 
 
 import asyncio
-from fastapi import FastAPI
+import logging
+import time
+from datetime import datetime
+from fastapi import FastAPI, Request
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from app.config import settings
 import uvicorn
 from app.api.endpoints.transactions import router as transactions_router
+from app.api.endpoints.metrics import router as metrics_router
 import threading
-from app.database import SessionLocal
+from app.database import SessionLocal, shards
 from app.models.transaction import Category, Transaction
+from app.ledger_cache import ledger_cache
+from app.autocomplete import description_index
+from app.idempotency import purge_idempotency_keys, save_transaction
+from app.bot.router import MessageRouter
+from app.partitions import add_months, ensure_partitions
+from app.profiling import profile_handler, track_queries
+from app.metrics import metrics
 
 app = FastAPI()
 app.include_router(transactions_router, prefix="/api/v1")
+app.include_router(metrics_router)
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """
+    Считает SQL-запросы и время обработки HTTP-запроса.
+
+    Метрики группируются по шаблону маршрута, а не по фактическому пути,
+    чтобы число временных рядов не росло с числом разных URL.
+    """
+    start = time.perf_counter()
+    status = "500"
+    try:
+        with track_queries(f"{request.method} {request.url.path}"):
+            response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - start,
+                        method=request.method, route=path)
+        metrics.inc("http_requests_total", method=request.method, route=path, status=status)
+
 
 # Словарь для хранения состояний пользователей
 user_states = {}
+metrics.gauge("bot_user_states", "Пользователи с незавершенным вводом транзакции", lambda: len(user_states))
+
+router = MessageRouter(user_states)
+
+# Сколько частых описаний предлагать кнопками после выбора категории
+SUGGESTIONS_LIMIT = 4
 
 
 class Bot(Client):
@@ -37,6 +79,7 @@ class Bot(Client):
     асинхронной обработки сообщений.
 
     Methods:
+        send_message(): Отправляет сообщение и учитывает его в метриках
         start(): Запускает бота
         idle(): Поддерживает бота в активном состоянии
     """
@@ -54,6 +97,10 @@ class Bot(Client):
             bot_token=settings.BOT_TOKEN
         )
 
+    async def send_message(self, *args, **kwargs):
+        metrics.inc("bot_messages_sent_total", method="send_message")
+        return await super().send_message(*args, **kwargs)
+
     async def start(self):
         await super().start()
         print("Bot started!")
@@ -83,7 +130,24 @@ def get_main_keyboard():
     ], resize_keyboard=True)
 
 
-@bot.on_message(filters.command("start"))
+def get_suggestions_keyboard(suggestions):
+    """
+    Создает клавиатуру с частыми описаниями транзакций пользователя.
+
+    Args:
+        suggestions (List[str]): Описания для кнопок
+
+    Returns:
+        ReplyKeyboardMarkup: По одной кнопке в строке, скрывается после нажатия
+    """
+    return ReplyKeyboardMarkup(
+        [[KeyboardButton(text)] for text in suggestions],
+        resize_keyboard=True, one_time_keyboard=True
+    )
+
+
+@router.command("start")
+@profile_handler
 async def start_command(client, message):
     """
     Обработчик команды /start.
@@ -95,7 +159,8 @@ async def start_command(client, message):
     )
 
 
-@bot.on_message(filters.command("help"))
+@router.command("help")
+@profile_handler
 async def help_command(client, message):
     """
     Обработчик команды /help.
@@ -105,20 +170,60 @@ async def help_command(client, message):
     Доступные команды:
     /add_expense [сумма] [категория] [описание] - Добавить расход
     /add_income [сумма] [категория] [описание] - Добавить доход
-    /statistics - Показать статистику
+    /statistics [month|ГГГГ-ММ] - Показать статистику
     /categories - Показать категории
     """
     help_text = """
     Доступные команды:
     /add_expense [сумма] [категория] [описание] - Добавить расход
     /add_income [сумма] [категория] [описание] - Добавить доход
-    /statistics - Показать статистику
+    /statistics [month|ГГГГ-ММ] - Показать статистику
     /categories - Показать категории
     """
     await message.reply_text(help_text, reply_markup=get_main_keyboard())
 
 
-@bot.on_message(filters.regex("^📊 Статистика$") | filters.command("statistics"))
+def get_statistics_period(command):
+    """
+    Определяет период статистики по аргументам команды /statistics.
+
+    Args:
+        command (List[str]): Команда и ее аргументы из Message.command или None
+
+    Returns:
+        Tuple[Optional[datetime], Optional[datetime]]: Начало и конец (не включая)
+            месяца либо (None, None) для статистики за все время
+
+    Raises:
+        ValueError: Если аргумент не "month" и не месяц в формате ГГГГ-ММ
+    """
+    if not command or len(command) < 2:
+        return None, None
+
+    if command[1] == "month":
+        now = datetime.utcnow()
+        date_from = datetime(now.year, now.month, 1)
+    else:
+        date_from = datetime.strptime(command[1], "%Y-%m")
+    next_month = add_months(date_from.date(), 1)
+    return date_from, datetime(next_month.year, next_month.month, 1)
+
+
+def user_session(user_id):
+    """
+    Сессия БД с данными пользователя.
+
+    При шардировании это сессия шарда пользователя (см. app.sharding),
+    иначе - обычная сессия основной БД.
+    """
+    if shards.enabled:
+        return shards.session_for(user_id)
+    return SessionLocal()
+
+
+@router.button("📊 Статистика")
+@router.command("statistics")
+@profile_handler
 async def statistics(client, message):
     """
     Показывает финансовую статистику пользователя.
@@ -127,25 +232,30 @@ async def statistics(client, message):
     - Общую сумму доходов
     - Общую сумму расходов
     - Текущий баланс
+
+    Суммы включают архивные транзакции (см. app.archive) и берутся из кэша
+    журналов, если он включен (см. app.ledger_cache). Команда
+    /statistics month или /statistics ГГГГ-ММ ограничивает статистику месяцем.
     """
-    db = SessionLocal()
     try:
-        expenses = db.query(Transaction).join(Category).filter(
-            Category.type == "expense",
-            Transaction.user_id == message.from_user.id
-        ).all()
-
-        incomes = db.query(Transaction).join(Category).filter(
-            Category.type == "income",
-            Transaction.user_id == message.from_user.id
-        ).all()
-
-        total_expense = sum(t.amount for t in expenses)
-        total_income = sum(t.amount for t in incomes)
+        date_from, date_to = get_statistics_period(getattr(message, "command", None))
+    except ValueError:
+        await message.reply_text("Укажите период в формате /statistics month или /statistics ГГГГ-ММ")
+        return
+
+    db = user_session(message.from_user.id)
+    try:
+        totals = ledger_cache.user_totals(db, message.from_user.id, date_from, date_to)
+
+        total_expense = totals.get("expense", 0)
+        total_income = totals.get("income", 0)
         balance = total_income - total_expense
+        # Возвращаем соединение в пул до ожидания ответа Telegram
+        db.close()
 
+        period = f" за {date_from:%Y-%m}" if date_from is not None else ""
         stats_text = f"""
-Статистика:
+Статистика{period}:
 Всего доходов: {total_income} руб.
 Всего расходов: {total_expense} руб.
 Баланс: {balance} руб.
@@ -157,7 +267,9 @@ async def statistics(client, message):
         db.close()
 
 
-@bot.on_message(filters.regex("^📋 Категории$") | filters.command("categories"))
+@router.button("📋 Категории")
+@router.command("categories")
+@profile_handler
 async def categories_command(client, message):
     db = SessionLocal()
     categories = db.query(Category).all()
@@ -165,8 +277,8 @@ async def categories_command(client, message):
     categories_text += "\n".join([f"- {cat.name}" for cat in categories if cat.type == "expense"])
     categories_text += "\n\nДоходы:\n"
     categories_text += "\n".join([f"- {cat.name}" for cat in categories if cat.type == "income"])
-    await message.reply_text(categories_text, reply_markup=get_main_keyboard())
     db.close()
+    await message.reply_text(categories_text, reply_markup=get_main_keyboard())
 
 
 def get_categories_keyboard(type_="expense"):
@@ -189,7 +301,8 @@ def get_categories_keyboard(type_="expense"):
     return InlineKeyboardMarkup(buttons)
 
 
-@bot.on_message(filters.regex("^💸 Добавить расход$"))
+@router.button("💸 Добавить расход")
+@profile_handler
 async def add_expense_start(client, message):
     """
     Начинает процесс добавления расхода.
@@ -201,7 +314,8 @@ async def add_expense_start(client, message):
     )
 
 
-@bot.on_message(filters.regex("^💰 Добавить доход$"))
+@router.button("💰 Добавить доход")
+@profile_handler
 async def add_income_start(client, message):
     """
     Начинает процесс добавления дохода.
@@ -214,26 +328,46 @@ async def add_income_start(client, message):
 
 
 @bot.on_callback_query()
+@profile_handler
 async def handle_callback(client, callback_query):
     """
     Обработчик нажатий на inline-кнопки категорий.
 
     Сохраняет выбранную категорию и запрашивает ввод суммы и описания.
+    Частые описания пользователя в этой категории предлагаются кнопками
+    (см. app.autocomplete).
     """
     data = callback_query.data
     if data.startswith("cat_"):
         _, type_, category_id = data.split("_")
-        user_states[callback_query.from_user.id] = {
+        user_id = callback_query.from_user.id
+        db = user_session(user_id)
+        try:
+            suggestions = description_index.suggest(db, user_id, category_id=int(category_id),
+                                                    limit=SUGGESTIONS_LIMIT)
+        finally:
+            db.close()
+
+        user_states[user_id] = {
             'category_id': int(category_id),
-            'type': type_
+            'type': type_,
+            'suggestions': suggestions
         }
-        await callback_query.message.reply_text(
-            f"Введите сумму и описание через пробел\nНапример: 1000 Описание",
-            reply_markup=get_main_keyboard()
-        )
-
-
-@bot.on_message(filters.text & filters.regex("^(?!📊|📋|💰|💸|/).+"))
+        if suggestions:
+            await callback_query.message.reply_text(
+                "Введите сумму и описание через пробел\nНапример: 1000 Описание\n\n"
+                "Или выберите описание кнопкой и затем введите сумму",
+                reply_markup=get_suggestions_keyboard(suggestions)
+            )
+        else:
+            await callback_query.message.reply_text(
+                f"Введите сумму и описание через пробел\nНапример: 1000 Описание",
+                reply_markup=get_main_keyboard()
+            )
+
+
+@router.text
+@profile_handler
 async def handle_transaction_input(client, message):
     """
     Обработчик ввода данных транзакции.
@@ -241,38 +375,60 @@ async def handle_transaction_input(client, message):
     Создает новую транзакцию на основе:
     - Выбранной ранее категории
     - Введенной суммы
-    - Введенного описания
+    - Введенного описания или описания, выбранного кнопкой подсказки
+
+    Вставка идемпотентна по ID чата и сообщения (см. app.idempotency):
+    на повторно доставленное сообщение бот отвечает сохраненной транзакцией
+    и не сбрасывает текущий диалог пользователя.
     """
     user_id = message.from_user.id
 
     if user_id not in user_states:
         return
 
+    db = None
     try:
+        state = user_states[user_id]
+        if message.text in state.get('suggestions', ()):
+            state['description'] = message.text
+            await message.reply_text(f"Описание: {message.text}\nВведите сумму")
+            return
+
         parts = message.text.split(maxsplit=1)
         if len(parts) < 1:
             await message.reply_text("Пожалуйста, введите сумму и описание")
             return
 
         amount = float(parts[0])
-        description = parts[1] if len(parts) > 1 else ""
+        description = parts[1] if len(parts) > 1 else state.get('description', "")
 
-        state = user_states[user_id]
-        db = SessionLocal()
+        db = user_session(user_id)
 
+        created_at = datetime.utcnow()
         transaction = Transaction(
             amount=amount,
             category_id=state['category_id'],
             description=description,
-            user_id=user_id
+            user_id=user_id,
+            created_at=created_at
         )
 
-        db.add(transaction)
-        db.commit()
-
-        category = db.query(Category).filter(Category.id == state['category_id']).first()
+        # Повторная доставка того же сообщения вернет уже созданную транзакцию
+        with ledger_cache.writing(user_id), description_index.writing(user_id):
+            transaction, created = save_transaction(db, transaction, f"tg:{message.chat.id}:{message.id}")
+            if created:
+                category_id = state['category_id']
+                ledger_cache.append(user_id, category_id, amount, created_at)
+                description_index.add(user_id, category_id, description)
+        if not created:
+            # Отвечаем сохраненной транзакцией: состояние уже относится к новому вводу
+            category_id, amount, description = transaction.category_id, transaction.amount, transaction.description
+
+        category = db.query(Category).filter(Category.id == category_id).first()
+        # Возвращаем соединение в пул до ожидания ответа Telegram
+        db.close()
 
-        transaction_type = "Доход" if state['type'] == "income" else "Расход"
+        transaction_type = "Доход" if category.type == "income" else "Расход"
         await message.reply_text(
             f"{transaction_type} добавлен:\n"
             f"Сумма: {amount} руб.\n"
@@ -281,14 +437,51 @@ async def handle_transaction_input(client, message):
             reply_markup=get_main_keyboard()
         )
 
-        del user_states[user_id]
+        if created:
+            user_states.pop(user_id, None)
 
     except ValueError:
         await message.reply_text("Неверный формат суммы. Пожалуйста, введите число.")
     except Exception as e:
         await message.reply_text(f"Произошла ошибка: {str(e)}")
     finally:
-        db.close()
+        if db is not None:
+            db.close()
+
+
+@bot.on_message(filters.text)
+async def route_message(client, message):
+    """
+    Единственный обработчик текстовых сообщений: выбирает функцию по кнопке,
+    команде или состоянию диалога пользователя (см. app.bot.router).
+    """
+    await router.dispatch(client, message)
+
+
+async def maintain_partitions(interval=24 * 60 * 60):
+    """
+    Раз в сутки создает недостающие будущие партиции transactions
+    в каждом шарде (без шардирования - в основной БД).
+    """
+    while True:
+        for shard_engine in shards.engines:
+            try:
+                await asyncio.to_thread(ensure_partitions, shard_engine)
+            except Exception:
+                logging.getLogger("finance_bot.partitions").exception("Ошибка обслуживания партиций")
+        await asyncio.sleep(interval)
+
+
+async def purge_expired_keys(interval=60 * 60):
+    """
+    Раз в час удаляет ключи идемпотентности старше окна дедупликации на всех шардах.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(shards.fan_out, purge_idempotency_keys)
+        except Exception:
+            logging.getLogger("finance_bot.idempotency").exception("Ошибка удаления ключей идемпотентности")
+        await asyncio.sleep(interval)
 
 
 def run_api():
@@ -301,10 +494,14 @@ async def main():
 
     Запускает:
     - FastAPI сервер в отдельном потоке
+    - Создание будущих партиций transactions раз в сутки
+    - Удаление старых ключей идемпотентности раз в час
     - Telegram бота в асинхронном режиме
     """
     api_thread = threading.Thread(target=run_api, daemon=True)
     api_thread.start()
+    partitions_task = asyncio.create_task(maintain_partitions())
+    purge_task = asyncio.create_task(purge_expired_keys())
 
     try:
         await bot.start()
@@ -313,6 +510,8 @@ async def main():
     except KeyboardInterrupt:
         print("Завершение работы...")
     finally:
+        partitions_task.cancel()
+        purge_task.cancel()
         await bot.stop()
 
 
@@ -0,0 +1,70 @@
+"""
+Общие фикстуры тестов Finance Tracker Bot.
+
+Фикстуры:
+- db_session: Сессия БД, изменения которой откатываются после теста.
+- query_budget: Проверка числа SQL-запросов, выполненных внутри блока.
+- category: Категория расходов в сессии db_session.
+
+Общие данные и функции тестов - в tests/helpers.py.
+"""
+
+import pytest
+from contextlib import contextmanager
+from sqlalchemy.orm import sessionmaker
+
+import run
+from app.database import engine
+from app.models.transaction import Category
+from app.profiling import track_queries
+
+
+@pytest.fixture
+def db_session(monkeypatch):
+    """
+    Сессия БД, изменения которой откатываются после теста.
+
+    Подменяет SessionLocal в run.py, поэтому обработчики бота пишут
+    в ту же незафиксированную транзакцию.
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=connection)
+    monkeypatch.setattr(run, "SessionLocal", session_factory)
+
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Проверяет, что блок выполняет не больше заданного числа SQL-запросов.
+
+    Example:
+        with query_budget(2):
+            await statistics(client, message)
+    """
+    @contextmanager
+    def check(max_queries):
+        with track_queries("query_budget") as stats:
+            yield stats
+        assert stats.count <= max_queries, (
+            f"Ожидалось не более {max_queries} SQL-запросов, выполнено {stats.count}:\n"
+            + "\n".join(stats.statements)
+        )
+
+    return check
+
+
+@pytest.fixture
+def category(db_session):
+    category = Category(name="Тестовая категория", type="expense")
+    db_session.add(category)
+    db_session.commit()
+    return category
@@ -0,0 +1,33 @@
+"""
+Общие данные и функции тестов Finance Tracker Bot.
+
+Функции:
+- make_message: Сообщение Telegram от тестового пользователя.
+
+Атрибуты:
+- USER_ID: ID тестового пользователя Telegram.
+"""
+
+import itertools
+from pyrogram import types
+from unittest.mock import AsyncMock, MagicMock
+
+USER_ID = 987654321
+MESSAGE_IDS = itertools.count(1)
+
+
+def make_message(text="", user_id=USER_ID, message_id=None):
+    """
+    Сообщение Telegram от пользователя user_id.
+
+    Каждое сообщение получает новый ID, если message_id не задан: бот
+    считает сообщение с тем же ID чата и сообщения повторной доставкой.
+    """
+    message = MagicMock(spec=types.Message)
+    message.reply_text = AsyncMock()
+    message.text = text
+    message.command = None
+    message.from_user = MagicMock(id=user_id)
+    message.chat = MagicMock(id=user_id)
+    message.id = next(MESSAGE_IDS) if message_id is None else message_id
+    return message
@@ -0,0 +1,124 @@
+"""
+Тесты архивации старых транзакций.
+
+Тесты:
+- test_pack_unpack_roundtrip: Блок архива распаковывается без потерь.
+- test_archive_moves_old_transactions: Старые транзакции уходят в архив, новые остаются.
+- test_reads_combine_hot_and_archive: Статистика и список транзакций не меняются после архивации.
+- test_rollups_accumulate_on_conflict: Повторная архивация месяца прибавляется к существующим итогам.
+- test_period_with_utc_offset: Границы периода со смещением приводятся к UTC.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pyrogram import Client, types
+from unittest.mock import AsyncMock, MagicMock
+
+import run
+from app.archive import _add_to_rollups, archive_transactions, pack_rows, unpack_rows, user_totals
+from app.api.endpoints.transactions import get_transactions
+from app.models.archive import TransactionArchive, TransactionRollup
+from app.models.transaction import Category, Transaction
+from .helpers import USER_ID
+
+NOW = datetime(2024, 12, 31, 12, 0)
+
+
+@pytest.fixture
+def ledger(db_session):
+    expense = Category(name="Архив: расход", type="expense")
+    income = Category(name="Архив: доход", type="income")
+    db_session.add_all([expense, income])
+    db_session.flush()
+
+    rows = [
+        (expense, 100.0, "Пятёрочка", 400),
+        (expense, 250.5, "такси", 395),
+        (income, 5000.0, None, 380),
+        (expense, 70.0, "метро", 10),
+        (income, 1000.0, "аванс", 5),
+    ]
+    for category, amount, description, age in rows:
+        created_at = NOW - timedelta(days=age)
+        db_session.add(Transaction(amount=amount, description=description, category_id=category.id,
+                                   user_id=USER_ID, created_at=created_at, updated_at=created_at))
+    db_session.commit()
+    return db_session
+
+
+def test_pack_unpack_roundtrip():
+    rows = [
+        {"id": 1, "amount": 10.5, "description": "Пятёрочка", "category_id": 3,
+         "created_at": datetime(2024, 1, 2, 3, 4, 5, 678000), "updated_at": datetime(2024, 1, 2, 3, 4, 5)},
+        {"id": 2, "amount": 99.0, "description": None, "category_id": None,
+         "created_at": datetime(2024, 1, 3), "updated_at": None},
+    ]
+
+    unpacked = unpack_rows(USER_ID, pack_rows(rows))
+
+    assert unpacked == [dict(row, user_id=USER_ID) for row in rows]
+
+
+def test_archive_moves_old_transactions(ledger):
+    archived = archive_transactions(ledger, horizon_days=365, batch_size=2, now=NOW)
+
+    assert archived == 3
+    assert ledger.query(Transaction).filter(Transaction.user_id == USER_ID).count() == 2
+    assert sum(a.row_count for a in ledger.query(TransactionArchive).filter_by(user_id=USER_ID)) == 3
+    assert sum(r.total for r in ledger.query(TransactionRollup).filter_by(user_id=USER_ID)) == 5350.5
+    assert archive_transactions(ledger, horizon_days=365, now=NOW) == 0
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_reads_combine_hot_and_archive(ledger):
+    def listed():
+        return sorted(
+            (row["amount"], row["description"]) if isinstance(row, dict) else (row.amount, row.description)
+            for row in get_transactions(db=ledger)
+            if (row["user_id"] if isinstance(row, dict) else row.user_id) == USER_ID
+        )
+
+    totals_before, list_before = dict(user_totals(ledger, USER_ID)), listed()
+    archive_transactions(ledger, horizon_days=365, now=NOW)
+
+    assert dict(user_totals(ledger, USER_ID)) == totals_before == {"expense": 420.5, "income": 6000.0}
+    assert listed() == list_before
+
+    message = MagicMock(spec=types.Message)
+    message.reply_text = AsyncMock()
+    message.from_user = MagicMock(id=USER_ID)
+    await run.statistics(MagicMock(spec=Client), message)
+
+    assert "Баланс: 5579.5 руб." in message.reply_text.call_args.args[0]
+
+
+def test_rollups_accumulate_on_conflict(ledger):
+    category_id = ledger.query(Category.id).filter(Category.name == "Архив: расход").scalar()
+    period = datetime(2023, 11, 1).date()
+    rows = [{"category_id": category_id, "amount": 10.0}, {"category_id": category_id, "amount": 5.5}]
+
+    _add_to_rollups(ledger, USER_ID + 1, period, rows)
+    _add_to_rollups(ledger, USER_ID + 1, period, rows[:1])
+
+    rollup = ledger.query(TransactionRollup).filter_by(user_id=USER_ID + 1).one()
+    assert (rollup.total, rollup.row_count) == (25.5, 3)
+
+
+def test_period_with_utc_offset(ledger):
+    archive_transactions(ledger, horizon_days=365, now=NOW)
+    moscow = timezone(timedelta(hours=3))
+
+    def amounts(date_from, date_to=None):
+        return sorted(
+            row["amount"] if isinstance(row, dict) else row.amount
+            for row in get_transactions(date_from=date_from, date_to=date_to, user_id=USER_ID, db=ledger)
+        )
+
+    assert amounts(datetime(2020, 1, 1, tzinfo=timezone.utc)) == [70.0, 100.0, 250.5, 1000.0, 5000.0]
+    # Граница 15:00 по Москве - 12:00 UTC, время создания архивной транзакции
+    boundary = (NOW - timedelta(days=400)).replace(tzinfo=timezone.utc).astimezone(moscow)
+    assert amounts(boundary, boundary + timedelta(days=10)) == [100.0, 250.5]
+    assert amounts(boundary + timedelta(seconds=1), datetime(2025, 1, 1, 3, tzinfo=moscow)) == [
+        70.0, 250.5, 1000.0, 5000.0
+    ]
@@ -0,0 +1,108 @@
+"""
+Тесты автодополнения описаний транзакций.
+
+Тесты:
+- test_prefix_index_ranks_by_frequency: Подсказки по префиксу упорядочены по частоте.
+- test_index_built_once_and_updated_on_insert: Индекс строится одним запросом и дополняется при вставке.
+- test_build_between_commit_and_add: Построение индекса во время вставки не учитывает описание дважды.
+- test_bot_offers_frequent_descriptions: Бот предлагает частые описания кнопками и принимает выбор.
+"""
+
+import pytest
+from pyrogram import Client, types
+from pyrogram.types import ReplyKeyboardMarkup
+from unittest.mock import MagicMock
+
+import run
+from app.api.endpoints import transactions as transactions_api
+from app.autocomplete import DescriptionIndex, PrefixIndex
+from app.models.transaction import Category, Transaction
+from app.schemas.transaction import TransactionCreate
+from .helpers import USER_ID, make_message
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = DescriptionIndex(100)
+    monkeypatch.setattr(run, "description_index", index)
+    monkeypatch.setattr(transactions_api, "description_index", index)
+    return index
+
+
+@pytest.fixture
+def described_category(db_session):
+    category = Category(name="Подсказки: расход", type="expense")
+    other = Category(name="Подсказки: другое", type="expense")
+    db_session.add_all([category, other])
+    db_session.flush()
+    for description, count in [("Пятёрочка", 3), ("такси", 5), ("Пятница кино", 1), ("", 2)]:
+        for _ in range(count):
+            db_session.add(Transaction(amount=100, description=description,
+                                       category_id=category.id, user_id=USER_ID))
+    db_session.add(Transaction(amount=100, description="пятёрочка", category_id=other.id, user_id=USER_ID))
+    db_session.add(Transaction(amount=100, description="Пятёрочка", category_id=category.id, user_id=USER_ID + 1))
+    db_session.commit()
+    return category
+
+
+def test_prefix_index_ranks_by_frequency():
+    index = PrefixIndex()
+    for text in ["Пятёрочка", "пятёрочка", "Пятница", "такси", "Пятёрочка"]:
+        index.add(text)
+
+    assert index.suggest("ПЯ") == ["Пятёрочка", "Пятница"]
+    assert index.suggest("", limit=2) == ["Пятёрочка", "Пятница"]
+    assert index.suggest("пятёр") == ["Пятёрочка"]
+    assert index.suggest("метро") == []
+
+
+def test_index_built_once_and_updated_on_insert(db_session, index, described_category, query_budget):
+    category_id = described_category.id
+    with query_budget(1):
+        assert transactions_api.autocomplete_descriptions(user_id=USER_ID, prefix="пя", limit=10,
+                                                          db=db_session) == ["Пятёрочка", "Пятница кино"]
+
+    for _ in range(5):
+        transactions_api.create_transaction(
+            TransactionCreate(amount=1, description="Пятница кино", category_id=category_id, user_id=USER_ID),
+            db=db_session
+        )
+
+    with query_budget(0):
+        assert index.suggest(db_session, USER_ID, "пя", category_id) == ["Пятница кино", "Пятёрочка"]
+        assert index.suggest(db_session, USER_ID, "", category_id, limit=1) == ["Пятница кино"]
+
+
+def test_build_between_commit_and_add(db_session, index, category):
+    with index.writing(USER_ID):
+        db_session.add(Transaction(amount=100, description="Метро", category_id=category.id, user_id=USER_ID))
+        db_session.commit()
+        # Запрос из другого потока строит индекс уже с новым описанием
+        assert index.suggest(db_session, USER_ID, "мет") == ["Метро"]
+        assert len(index) == 0
+        index.add(USER_ID, category.id, "Метро")
+
+    index.suggest(db_session, USER_ID, "мет")
+    assert index._users[USER_ID][category.id].counts["метро"] == 1
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bot_offers_frequent_descriptions(db_session, index, described_category, monkeypatch):
+    monkeypatch.setattr(run, "user_states", {})
+    callback = MagicMock(spec=types.CallbackQuery)
+    callback.data = f"cat_expense_{described_category.id}"
+    callback.from_user = MagicMock(id=USER_ID)
+    callback.message = make_message()
+
+    await run.handle_callback(MagicMock(spec=Client), callback)
+
+    keyboard = callback.message.reply_text.call_args.kwargs["reply_markup"]
+    assert isinstance(keyboard, ReplyKeyboardMarkup)
+    assert [row[0].text for row in keyboard.keyboard] == ["такси", "Пятёрочка", "Пятница кино"]
+
+    await run.handle_transaction_input(MagicMock(spec=Client), make_message("такси"))
+    await run.handle_transaction_input(MagicMock(spec=Client), make_message("350"))
+
+    created = db_session.query(Transaction).filter_by(user_id=USER_ID, amount=350).one()
+    assert created.description == "такси"
+    assert USER_ID not in run.user_states
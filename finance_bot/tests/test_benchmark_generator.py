@@ -0,0 +1,38 @@
+"""
+Тесты генератора синтетического журнала для бенчмарков.
+
+Тесты:
+- test_generator_is_deterministic: Одинаковые параметры дают одинаковые данные.
+- test_generator_respects_spec: Проверяет число строк, пользователей и категорий.
+"""
+
+from collections import Counter
+from datetime import datetime
+
+from benchmarks.generator import FIRST_USER_ID, LedgerSpec, generate_transactions
+
+CATEGORY_IDS = {"Продукты": 1, "Транспорт": 2, "Зарплата": 3}
+NOW = datetime(2024, 12, 31)
+
+
+def test_generator_is_deterministic():
+    spec = LedgerSpec(users=3, transactions_per_user=20)
+
+    first = list(generate_transactions(spec, CATEGORY_IDS, now=NOW))
+    second = list(generate_transactions(spec, CATEGORY_IDS, now=NOW))
+
+    assert first == second
+
+
+def test_generator_respects_spec():
+    spec = LedgerSpec(users=5, transactions_per_user=200, days=30,
+                      distribution={"Продукты": 0.9, "Транспорт": 0.1, "Неизвестная": 1.0})
+
+    rows = list(generate_transactions(spec, CATEGORY_IDS, now=NOW))
+    categories = Counter(row["category_id"] for row in rows)
+
+    assert len(rows) == spec.total == 1000
+    assert {row["user_id"] for row in rows} == set(range(FIRST_USER_ID, FIRST_USER_ID + 5))
+    assert set(categories) == {1, 2}
+    assert categories[1] > categories[2] * 4
+    assert all((NOW - row["created_at"]).days < 30 for row in rows)
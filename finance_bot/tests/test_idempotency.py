@@ -0,0 +1,104 @@
+"""
+Тесты идемпотентной вставки транзакций.
+
+Тесты:
+- test_bot_redelivery_creates_one_transaction: Повторная доставка сообщения не создает дубль,
+  отвечает сохраненной транзакцией и не сбрасывает новый ввод пользователя.
+- test_api_retry_returns_same_transaction: Повтор с тем же Idempotency-Key возвращает ту же транзакцию.
+- test_purge_removes_expired_keys: Ключи старше окна удаляются.
+- test_replay_after_archive_reclaims_key: Повтор по ключу архивированной транзакции создает ее заново.
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from pyrogram import Client
+from unittest.mock import MagicMock
+
+import run
+from app.api.endpoints.transactions import create_transaction
+from app.archive import archive_transactions
+from app.idempotency import purge_idempotency_keys
+from app.models.idempotency import IdempotencyKey
+from app.models.transaction import Category, Transaction
+from app.schemas.transaction import TransactionCreate
+from .helpers import USER_ID, make_message
+
+
+def user_transactions(db_session):
+    return db_session.query(Transaction).filter(Transaction.user_id == USER_ID).count()
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bot_redelivery_creates_one_transaction(db_session, category, monkeypatch):
+    expense_id = category.id
+    salary = Category(name="Тестовая зарплата", type="income")
+    db_session.add(salary)
+    db_session.commit()
+    salary_id = salary.id
+    monkeypatch.setattr(run, "user_states", {USER_ID: {'category_id': expense_id, 'type': 'expense'}})
+
+    await run.handle_transaction_input(MagicMock(spec=Client), make_message("150 Пятёрочка", message_id=10))
+    assert USER_ID not in run.user_states
+
+    # Пользователь начал новый ввод, и Telegram повторно доставил сообщение 10
+    pending = {'category_id': salary_id, 'type': 'income'}
+    run.user_states[USER_ID] = dict(pending)
+    message = make_message("150 Пятёрочка", message_id=10)
+    await run.handle_transaction_input(MagicMock(spec=Client), message)
+
+    reply = message.reply_text.call_args.args[0]
+    assert reply.startswith("Расход добавлен")
+    assert "Категория: Тестовая категория" in reply and "Сумма: 150.0 руб." in reply
+    assert run.user_states[USER_ID] == pending
+    assert user_transactions(db_session) == 1
+
+    await run.handle_transaction_input(MagicMock(spec=Client), make_message("50000 Аванс", message_id=11))
+    assert user_transactions(db_session) == 2
+    assert USER_ID not in run.user_states
+
+
+def test_api_retry_returns_same_transaction(db_session, category, query_budget):
+    data = TransactionCreate(amount=500.0, description="Продукты", category_id=category.id, user_id=USER_ID)
+
+    # INSERT транзакции и ключа, затем refresh ответа, без предварительного поиска ключа
+    with query_budget(3):
+        first = create_transaction(data, db_session, idempotency_key="retry-1")
+    replay = create_transaction(data, db_session, idempotency_key="retry-1")
+    assert replay.id == first.id
+
+    other = create_transaction(data, db_session, idempotency_key="retry-2")
+    assert other.id != first.id
+    create_transaction(data, db_session)
+    assert user_transactions(db_session) == 3
+
+
+def test_purge_removes_expired_keys(db_session, category):
+    data = TransactionCreate(amount=500.0, category_id=category.id, user_id=USER_ID)
+    create_transaction(data, db_session, idempotency_key="old")
+    create_transaction(data, db_session, idempotency_key="fresh")
+    db_session.query(IdempotencyKey).filter(IdempotencyKey.key == f"api:{USER_ID}:old").update(
+        {IdempotencyKey.created_at: datetime.utcnow() - timedelta(hours=25)}
+    )
+
+    assert purge_idempotency_keys(db_session, window_hours=24) == 1
+    assert [key for (key,) in db_session.query(IdempotencyKey.key)] == [f"api:{USER_ID}:fresh"]
+
+    # После удаления ключа повтор снова создает транзакцию
+    create_transaction(data, db_session, idempotency_key="old")
+    assert user_transactions(db_session) == 3
+
+
+def test_replay_after_archive_reclaims_key(db_session, category):
+    data = TransactionCreate(amount=500.0, category_id=category.id, user_id=USER_ID)
+    create_transaction(data, db_session, idempotency_key="archived")
+    archive_transactions(db_session, horizon_days=0, now=datetime.utcnow() + timedelta(seconds=1))
+    assert user_transactions(db_session) == 0
+
+    # Ключ еще в окне, но отвечать ранее созданной транзакцией нечем
+    replay = create_transaction(data, db_session, idempotency_key="archived")
+    assert replay is not None
+    assert user_transactions(db_session) == 1
+    key = db_session.query(IdempotencyKey).filter(IdempotencyKey.key == f"api:{USER_ID}:archived").one()
+    assert key.transaction_id == replay.id
+
+    assert create_transaction(data, db_session, idempotency_key="archived").id == replay.id
@@ -0,0 +1,158 @@
+"""
+Тесты кэша журналов активных пользователей.
+
+Тесты:
+- test_totals_match_database: Суммы из кэша совпадают с запросом к БД, в том числе после архивации.
+- test_statistics_served_from_cache: Повторная статистика не обращается к БД и видит новую транзакцию.
+- test_eviction_by_memory_budget: Кэш вытесняет давно не использованные журналы при превышении объема.
+- test_append_during_load_not_cached: Журнал, во время загрузки которого вставлена транзакция, не кэшируется.
+- test_rollups_without_category: Итоги архива без категории не перечитывают справочник категорий.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from pyrogram import Client
+from unittest.mock import MagicMock
+
+import run
+from app.archive import _add_to_rollups, archive_transactions, user_totals
+from app.ledger_cache import LedgerCache
+from app.models.transaction import Category, Transaction
+from .helpers import USER_ID, make_message
+
+NOW = datetime(2024, 12, 31, 12, 0)
+
+
+@pytest.fixture
+def categories(db_session):
+    expense = Category(name="Кэш: расход", type="expense")
+    income = Category(name="Кэш: доход", type="income")
+    db_session.add_all([expense, income])
+    db_session.flush()
+    return expense, income
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = LedgerCache(1 << 20)
+    monkeypatch.setattr(run, "ledger_cache", cache)
+    return cache
+
+
+def add(db, category, amount, created_at, user_id=USER_ID):
+    db.add(Transaction(amount=amount, category_id=category.id, user_id=user_id,
+                       created_at=created_at, updated_at=created_at))
+
+
+def test_totals_match_database(db_session, categories, cache):
+    expense, income = categories
+    for age, category, amount in [(400, expense, 100.0), (395, income, 5000.0), (40, expense, 70.5),
+                                  (10, expense, 30.0), (3, income, 1000.0)]:
+        add(db_session, category, amount, NOW - timedelta(days=age))
+    db_session.commit()
+
+    periods = [(None, None), (datetime(2024, 12, 1), datetime(2025, 1, 1)),
+               (datetime(2023, 11, 1), datetime(2023, 12, 1)), (datetime(2023, 1, 1), None)]
+
+    for date_from, date_to in periods:
+        assert dict(cache.user_totals(db_session, USER_ID, date_from, date_to)) == \
+            pytest.approx(dict(user_totals(db_session, USER_ID, date_from, date_to)))
+
+    archive_transactions(db_session, horizon_days=365, now=NOW)
+    cache.clear()
+
+    for date_from, date_to in periods:
+        assert dict(cache.user_totals(db_session, USER_ID, date_from, date_to)) == \
+            pytest.approx(dict(user_totals(db_session, USER_ID, date_from, date_to)))
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_statistics_served_from_cache(db_session, categories, cache, query_budget, monkeypatch):
+    expense, _ = categories
+    add(db_session, expense, 100.0, datetime.utcnow())
+    db_session.commit()
+
+    await run.statistics(MagicMock(spec=Client), make_message())
+    monkeypatch.setitem(run.user_states, USER_ID, {'category_id': expense.id, 'type': 'expense'})
+    await run.handle_transaction_input(MagicMock(spec=Client), make_message("250 такси"))
+
+    message = make_message()
+    with query_budget(0):
+        await run.statistics(MagicMock(spec=Client), message)
+
+    assert "Всего расходов: 350.0 руб." in message.reply_text.call_args.args[0]
+
+
+def test_eviction_by_memory_budget(db_session, categories):
+    expense, _ = categories
+    users = [USER_ID + i for i in range(4)]
+    for user_id in users:
+        for day in range(50):
+            add(db_session, expense, 10.0, NOW - timedelta(days=day), user_id=user_id)
+    db_session.commit()
+
+    probe = LedgerCache(1 << 20)
+    ledger_size = probe.get(db_session, users[0]).nbytes
+    cache = LedgerCache(ledger_size * 2)
+
+    cache.get(db_session, users[0])
+    cache.get(db_session, users[1])
+    cache.get(db_session, users[0])
+    cache.get(db_session, users[2])
+
+    assert len(cache) == 2
+    assert cache.nbytes <= cache.max_bytes
+    assert set(cache._ledgers) == {users[0], users[2]}
+
+
+def test_append_during_load_not_cached(db_session, categories, cache, monkeypatch):
+    expense, _ = categories
+    add(db_session, expense, 100.0, NOW)
+    db_session.commit()
+    load = cache._load
+
+    def load_with_concurrent_insert(db, user_id):
+        ledger = load(db, user_id)
+        # Вставка из потока API зафиксирована после того, как строки прочитаны
+        with cache.writing(user_id):
+            add(db, expense, 50.0, NOW + timedelta(hours=1))
+            db.commit()
+            cache.append(user_id, expense.id, 50.0, NOW + timedelta(hours=1))
+        return ledger
+
+    monkeypatch.setattr(cache, "_load", load_with_concurrent_insert)
+    cache.get(db_session, USER_ID)
+    assert len(cache) == 0 and not len(cache._loads)
+
+    monkeypatch.setattr(cache, "_load", load)
+    assert cache.user_totals(db_session, USER_ID) == {"expense": 150.0}
+    assert len(cache) == 1
+
+
+def test_load_between_commit_and_append(db_session, categories, cache):
+    expense, _ = categories
+    add(db_session, expense, 100.0, NOW)
+    db_session.commit()
+
+    with cache.writing(USER_ID):
+        add(db_session, expense, 50.0, NOW + timedelta(hours=1))
+        db_session.commit()
+        # Запрос из другого потока читает журнал уже с новой строкой
+        assert cache.user_totals(db_session, USER_ID) == {"expense": 150.0}
+        assert len(cache) == 0
+        cache.append(USER_ID, expense.id, 50.0, NOW + timedelta(hours=1))
+
+    assert cache.user_totals(db_session, USER_ID) == {"expense": 150.0}
+    assert len(cache) == 1
+
+
+def test_rollups_without_category(db_session, categories, cache, query_budget):
+    expense, _ = categories
+    add(db_session, expense, 100.0, NOW)
+    _add_to_rollups(db_session, USER_ID, datetime(2023, 1, 1).date(), [{"category_id": None, "amount": 20.0}])
+    db_session.commit()
+
+    assert cache.user_totals(db_session, USER_ID) == {"expense": 100.0}
+    with query_budget(0):
+        assert cache.user_totals(db_session, USER_ID) == {"expense": 100.0}
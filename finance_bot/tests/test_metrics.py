@@ -0,0 +1,100 @@
+"""
+Тесты метрик в формате Prometheus.
+
+Тесты:
+- test_counter_and_histogram_render: Проверяет вывод счетчиков и накопительных корзин гистограмм.
+- test_threads_write_separate_shards: Проверяет, что записи из разных потоков суммируются.
+- test_handler_metrics: Проверяет метрики, записываемые декоратором profile_handler.
+- test_metrics_endpoint: Проверяет эндпоинт /metrics.
+- test_pool_metrics_labeled_by_shard: Проверяет, что метрики пула каждого шарда идут отдельной серией.
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from pyrogram import Client, types
+from unittest.mock import AsyncMock, MagicMock
+
+import run
+from app.metrics import MeteredQueuePool, Metrics, metrics, register_pool_metrics
+from app.api.endpoints.metrics import get_metrics
+
+
+def test_counter_and_histogram_render():
+    registry = Metrics(buckets=(0.1, 1.0))
+    registry.describe("requests_total", "counter", "Запросы")
+    registry.inc("requests_total", route="/a")
+    registry.inc("requests_total", 2, route="/a")
+    registry.observe("latency_seconds", 0.05)
+    registry.observe("latency_seconds", 0.5)
+    registry.observe("latency_seconds", 5)
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+    assert "latency_seconds_sum 5.55" in text
+
+
+def test_threads_write_separate_shards():
+    registry = Metrics()
+
+    def work():
+        for _ in range(1000):
+            registry.inc("calls_total")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counters, _ = registry.collect()
+    assert counters[("calls_total", ())] == 4000
+    assert len(registry._shards) == 4
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_handler_metrics():
+    message = MagicMock(spec=types.Message)
+    message.reply_text = AsyncMock()
+
+    before, _ = metrics.collect()
+    await run.help_command(MagicMock(spec=Client), message)
+    after, histograms = metrics.collect()
+
+    key = ("bot_handler_calls_total", (("handler", "help_command"), ("status", "ok")))
+    assert after[key] == before[key] + 1
+    assert ("bot_handler_duration_seconds", (("handler", "help_command"),)) in histograms
+
+
+def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setitem(run.user_states, 1, {'category_id': 1, 'type': 'expense'})
+
+    response = get_metrics()
+    body = response.body.decode()
+
+    assert response.media_type.startswith("text/plain")
+    assert "bot_user_states 1" in body
+    assert 'db_pool_checked_out{shard="main"}' in body
+
+
+def test_pool_metrics_labeled_by_shard(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/shard.db", poolclass=MeteredQueuePool)
+    register_pool_metrics(engine, "7")
+    # Метка переживает пересоздание пула
+    engine.dispose()
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        body = metrics.render()
+        assert 'db_pool_checked_out{shard="7"} 1' in body
+    engine.dispose()
+
+    _, histograms = metrics.collect()
+    assert histograms[("db_pool_checkout_seconds", (("shard", "7"),))][-1] == 1
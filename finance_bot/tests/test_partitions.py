@@ -0,0 +1,94 @@
+"""
+Тесты месячного секционирования transactions и запросов за период.
+
+Тесты:
+- test_month_ranges: Границы партиций переходят через конец года.
+- test_is_partition_table: Распознаются только партиции transactions.
+- test_statistics_period: Разбор аргумента команды /statistics.
+- test_ensure_partitions_skips_other_databases: Вне PostgreSQL партиции не создаются.
+- test_period_filters: Статистика и список транзакций ограничиваются периодом.
+- test_primary_key_includes_created_at: Модель и DDL используют ключ (id, created_at), как миграция.
+"""
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+
+import run
+from app.archive import archive_transactions, user_totals
+from app.api.endpoints.transactions import get_transactions
+from app.models.transaction import Category, Transaction
+from app.partitions import ensure_partitions, is_partition_table, month_ranges
+from app.profiling import track_queries
+from .helpers import USER_ID
+
+
+def test_month_ranges():
+    assert month_ranges(date(2024, 11, 15), date(2025, 1, 1)) == [
+        ("transactions_y2024m11", date(2024, 11, 1), date(2024, 12, 1)),
+        ("transactions_y2024m12", date(2024, 12, 1), date(2025, 1, 1)),
+        ("transactions_y2025m01", date(2025, 1, 1), date(2025, 2, 1)),
+    ]
+
+
+def test_is_partition_table():
+    assert is_partition_table("transactions_y2024m01")
+    assert is_partition_table("transactions_default")
+    assert not is_partition_table("transactions")
+    assert not is_partition_table("transactions_archive")
+    assert not is_partition_table(None)
+
+
+def test_statistics_period():
+    assert run.get_statistics_period(None) == (None, None)
+    assert run.get_statistics_period(["statistics"]) == (None, None)
+    assert run.get_statistics_period(["statistics", "2024-12"]) == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+    with pytest.raises(ValueError):
+        run.get_statistics_period(["statistics", "декабрь"])
+
+
+def test_ensure_partitions_skips_other_databases():
+    assert ensure_partitions(create_engine("sqlite://")) == []
+
+
+def test_period_filters(db_session):
+    category = Category(name="Период: расход", type="expense")
+    db_session.add(category)
+    db_session.flush()
+    for amount, created_at in ((100.0, datetime(2024, 1, 10)), (200.0, datetime(2024, 2, 5)),
+                               (300.0, datetime(2024, 2, 20)), (400.0, datetime(2024, 3, 1))):
+        db_session.add(Transaction(amount=amount, category_id=category.id, user_id=USER_ID, created_at=created_at))
+    db_session.commit()
+    february = (datetime(2024, 2, 1), datetime(2024, 3, 1))
+
+    def listed():
+        return sorted(
+            row["amount"] if isinstance(row, dict) else row.amount
+            for row in get_transactions(*february, db=db_session)
+            if (row["user_id"] if isinstance(row, dict) else row.user_id) == USER_ID
+        )
+
+    assert user_totals(db_session, USER_ID, *february) == {"expense": 500.0}
+    assert listed() == [200.0, 300.0]
+
+    archive_transactions(db_session, horizon_days=0, now=datetime(2024, 2, 10))
+
+    assert user_totals(db_session, USER_ID, *february) == {"expense": 500.0}
+    assert listed() == [200.0, 300.0]
+
+
+def test_primary_key_includes_created_at(db_session, category):
+    assert "PRIMARY KEY (id, created_at)" in str(CreateTable(Transaction.__table__).compile(dialect=postgresql.dialect()))
+    # В SQLite id остается rowid и выдается автоматически
+    assert "PRIMARY KEY (id)" in str(CreateTable(Transaction.__table__).compile(dialect=sqlite.dialect()))
+
+    transaction = Transaction(amount=10.0, category_id=category.id, user_id=USER_ID)
+    db_session.add(transaction)
+    db_session.commit()
+    with track_queries("refresh") as stats:
+        db_session.refresh(transaction)
+    assert transaction.id is not None
+    assert "transactions.created_at =" in stats.statements[0]
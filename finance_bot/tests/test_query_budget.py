@@ -0,0 +1,135 @@
+"""
+Тесты бюджета SQL-запросов для обработчиков бота и маршрутов API.
+
+Каждый тест выполняет обработчик внутри фикстуры query_budget и проверяет,
+что число SQL-выражений не превышает ожидаемого. Рост числа запросов
+(например, N+1 при ленивой загрузке Transaction.category) роняет тест.
+
+Фикстуры:
+- db_session: Сессия БД, изменения которой откатываются после теста.
+- query_budget: Контекстный менеджер с проверкой числа SQL-запросов.
+"""
+
+import pytest
+from pyrogram import Client
+from unittest.mock import MagicMock
+
+import run
+from app.autocomplete import DescriptionIndex
+from app.models.transaction import Category, Transaction
+from app.api.endpoints.transactions import get_transactions, create_transaction
+from app.schemas.transaction import TransactionCreate
+from app.profiling import track_queries
+from .helpers import USER_ID, make_message
+
+
+def test_track_queries_counts_nested_blocks(db_session):
+    """
+    Проверяет, что выражения вложенного блока учитываются во внешнем.
+    """
+    with track_queries("outer") as outer:
+        db_session.query(Category).all()
+        with track_queries("inner") as inner:
+            db_session.query(Transaction).all()
+
+    assert inner.count == 1
+    assert outer.count == 2
+
+
+@pytest.mark.asyncio(loop_scope="function")
+@pytest.mark.parametrize("handler", [run.start_command, run.help_command, run.handle_callback])
+async def test_handlers_without_queries(query_budget, handler):
+    """
+    Обработчики без обращения к БД не должны выполнять запросов.
+    """
+    message = make_message()
+    message.data = "noop"
+    message.message = make_message()
+
+    with query_budget(0):
+        await handler(MagicMock(spec=Client), message)
+
+
+@pytest.mark.asyncio(loop_scope="function")
+@pytest.mark.parametrize("handler", [
+    run.categories_command, run.add_expense_start, run.add_income_start,
+])
+async def test_category_handlers_budget(db_session, query_budget, handler):
+    """
+    Обработчики со списком категорий выполняют один запрос.
+    """
+    with query_budget(1):
+        await handler(MagicMock(spec=Client), make_message())
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_category_callback_budget(db_session, query_budget, category, monkeypatch):
+    """
+    Выбор категории строит индекс описаний одним запросом, повторный - без запросов.
+    """
+    monkeypatch.setattr(run, "description_index", DescriptionIndex(100))
+    monkeypatch.setattr(run, "user_states", {})
+    for description in ("Такси", "Такси", "Метро"):
+        db_session.add(Transaction(amount=100, description=description, category_id=category.id, user_id=USER_ID))
+    db_session.commit()
+    callback = make_message()
+    callback.data = f"cat_expense_{category.id}"
+    callback.message = make_message()
+
+    with query_budget(1):
+        await run.handle_callback(MagicMock(spec=Client), callback)
+    with query_budget(0):
+        await run.handle_callback(MagicMock(spec=Client), callback)
+
+    assert run.user_states[USER_ID]['suggestions'] == ["Такси", "Метро"]
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_statistics_budget(db_session, query_budget, category):
+    """
+    Статистика не зависит от числа транзакций пользователя.
+    """
+    for amount in (100, 200, 300):
+        db_session.add(Transaction(amount=amount, category_id=category.id, user_id=USER_ID))
+    db_session.commit()
+
+    with query_budget(2):
+        await run.statistics(MagicMock(spec=Client), make_message())
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_transaction_input_budget(db_session, query_budget, category, monkeypatch):
+    """
+    Вставка транзакции из бота: INSERT транзакции и ключа идемпотентности,
+    чтение названия категории.
+    """
+    monkeypatch.setitem(run.user_states, USER_ID, {'category_id': category.id, 'type': 'expense'})
+    message = make_message("150 Такси")
+
+    with query_budget(3):
+        await run.handle_transaction_input(MagicMock(spec=Client), message)
+
+    assert "Расход добавлен" in message.reply_text.call_args.args[0]
+
+
+def test_get_transactions_budget(db_session, query_budget, category):
+    """
+    Список транзакций загружается двумя запросами (горячие и архивные)
+    независимо от числа строк.
+    """
+    for amount in (100, 200, 300):
+        db_session.add(Transaction(amount=amount, category_id=category.id, user_id=USER_ID))
+    db_session.commit()
+
+    with query_budget(2):
+        get_transactions(db=db_session)
+
+
+def test_create_transaction_budget(db_session, query_budget, category):
+    """
+    Создание транзакции через API: INSERT и обновление строки.
+    """
+    data = TransactionCreate(amount=500, description="Продукты", category_id=category.id)
+
+    with query_budget(2):
+        create_transaction(data, db_session)
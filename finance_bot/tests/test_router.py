@@ -0,0 +1,61 @@
+"""
+Тесты маршрутизации входящих сообщений бота.
+
+Тесты:
+- test_buttons_and_commands: Кнопки находятся по точному тексту, команды - по таблице с аргументами.
+- test_free_text_routed_by_state: Свободный текст уходит в обработчик ввода только в диалоге.
+- test_discarded_message_skips_handlers: Отброшенное сообщение не вызывает обработчиков.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import run
+from app.bot.router import MessageRouter
+from app.metrics import metrics
+from .helpers import USER_ID, make_message
+
+
+def test_buttons_and_commands():
+    resolve = run.router.resolve
+
+    assert resolve(make_message("📊 Статистика")) is run.statistics
+    assert resolve(make_message("💰 Добавить доход")) is run.add_income_start
+
+    message = make_message("/Statistics@Finance_Bot 2024-05")
+    assert resolve(message, "finance_bot") is run.statistics
+    assert message.command == ["statistics", "2024-05"]
+
+    assert resolve(make_message("/start"), "finance_bot") is run.start_command
+    assert resolve(make_message("/start@other_bot"), "finance_bot") is None
+    assert resolve(make_message("/settings")) is None
+    assert resolve(make_message("/")) is None
+
+
+def test_free_text_routed_by_state(monkeypatch):
+    monkeypatch.setattr(run, "user_states", {USER_ID: {'category_id': 1, 'type': 'expense'}})
+    monkeypatch.setattr(run.router, "states", run.user_states)
+
+    assert run.router.resolve(make_message("350 такси")) is run.handle_transaction_input
+    assert run.router.resolve(make_message("📊 Статистика за год")) is run.handle_transaction_input
+    assert run.router.resolve(make_message("350 такси", USER_ID + 1)) is None
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_discarded_message_skips_handlers():
+    router = MessageRouter(states={})
+    handler = AsyncMock()
+    router.button("💸 Добавить расход")(handler)
+    router.text(handler)
+
+    def discarded():
+        counters, _ = metrics.collect()
+        return counters.get(("bot_messages_discarded_total", ()), 0)
+
+    before = discarded()
+    await router.dispatch(MagicMock(me=None), make_message("привет"))
+    assert discarded() == before + 1
+    handler.assert_not_called()
+
+    await router.dispatch(MagicMock(me=None), make_message("💸 Добавить расход"))
+    handler.assert_awaited_once()
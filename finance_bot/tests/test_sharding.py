@@ -0,0 +1,167 @@
+"""
+Тесты шардирования данных пользователей по user_id.
+
+Шарды - отдельные файлы SQLite во временном каталоге.
+
+Тесты:
+- test_jump_hash_is_balanced_and_stable: Пользователи равномерно делятся между шардами
+  и при добавлении шарда переезжают только на новый шард.
+- test_bot_handlers_touch_one_shard: Обработчики бота обращаются только к шарду пользователя.
+- test_api_fans_out_across_shards: Список без user_id объединяет все шарды, с user_id читает один.
+- test_categories_copied_with_main_ids: Категории шарда получают id основной БД.
+"""
+
+from collections import Counter
+
+import pytest
+from pyrogram import Client
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import MagicMock
+
+import run
+from app.api.endpoints import transactions as transactions_api
+from app.database import Base
+from app.init_db import _add_categories, copy_categories
+from app.models.transaction import Category, Transaction
+from app.schemas.transaction import TransactionCreate
+from app.sharding import ShardRouter, jump_hash
+from .helpers import make_message
+
+SHARD_COUNT = 3
+USER_IDS = range(100_000_001, 100_000_013)
+
+
+@pytest.fixture
+def main_db(tmp_path):
+    """
+    Основная БД со справочником категорий, id которого идут с пропуском.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/main.db")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([Category(name="Удаленная категория", type="expense"), Category(name="Своя категория", type="expense")])
+    db.commit()
+    db.query(Category).filter(Category.name == "Удаленная категория").delete()
+    db.commit()
+    _add_categories(db)
+    yield db
+    db.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch, main_db):
+    engines = [create_engine(f"sqlite:///{tmp_path}/shard{i}.db") for i in range(SHARD_COUNT)]
+    router = ShardRouter(engines)
+    for engine, factory in zip(engines, router.sessionmakers):
+        Base.metadata.create_all(engine)
+        db = factory()
+        copy_categories(main_db, db)
+        db.close()
+
+    monkeypatch.setattr(run, "shards", router)
+    monkeypatch.setattr(transactions_api, "shards", router)
+
+    queries = Counter()
+    for index, engine in enumerate(engines):
+        event.listen(engine, "before_cursor_execute",
+                     lambda *args, index=index: queries.update([index]))
+    router.queries = queries
+
+    yield router
+    for engine in engines:
+        engine.dispose()
+
+
+def expense_category_id(router):
+    db = router.sessionmakers[0]()
+    try:
+        return db.query(Category.id).filter(Category.type == "expense").first()[0]
+    finally:
+        db.close()
+
+
+def test_jump_hash_is_balanced_and_stable():
+    keys = range(1, 20_001)
+    before = [jump_hash(key, 4) for key in keys]
+    after = [jump_hash(key, 5) for key in keys]
+
+    counts = Counter(before)
+    assert set(counts) == {0, 1, 2, 3}
+    assert all(4000 < count < 6000 for count in counts.values())
+
+    moved = [(old, new) for old, new in zip(before, after) if old != new]
+    assert all(new == 4 for _, new in moved)
+    assert 3000 < len(moved) < 5000
+
+
+@pytest.mark.asyncio(loop_scope="function")
+async def test_bot_handlers_touch_one_shard(shards):
+    """
+    Ввод транзакции и статистика выполняют запросы только к шарду пользователя.
+    """
+    category_id = expense_category_id(shards)
+    user_id = USER_IDS[0]
+    shard = shards.shard_for(user_id)
+    shards.queries.clear()
+
+    run.user_states[user_id] = {'category_id': category_id, 'type': 'expense'}
+    await run.handle_transaction_input(MagicMock(spec=Client), make_message("350 такси", user_id))
+    message = make_message(user_id=user_id)
+    await run.statistics(MagicMock(spec=Client), message)
+
+    assert set(shards.queries) == {shard}
+    assert "Всего расходов: 350.0 руб." in message.reply_text.call_args.args[0]
+
+
+def test_api_fans_out_across_shards(shards):
+    category_id = expense_category_id(shards)
+    for user_id in USER_IDS:
+        transactions_api.create_transaction(
+            TransactionCreate(amount=100, description="Продукты", category_id=category_id, user_id=user_id),
+            db=None
+        )
+
+    for index, factory in enumerate(shards.sessionmakers):
+        db = factory()
+        stored = {row.user_id for row in db.query(Transaction.user_id)}
+        db.close()
+        assert stored == {user_id for user_id in USER_IDS if shards.shard_for(user_id) == index}
+
+    rows = transactions_api.get_transactions(db=None)
+    assert sorted(row.user_id for row in rows) == list(USER_IDS)
+
+    user_id = USER_IDS[5]
+    shards.queries.clear()
+    rows = transactions_api.get_transactions(user_id=user_id, db=None)
+    assert [row.user_id for row in rows] == [user_id]
+    assert set(shards.queries) == {shards.shard_for(user_id)}
+
+
+def test_categories_copied_with_main_ids(main_db, shards):
+    expected = sorted(main_db.query(Category.id, Category.name, Category.type))
+    assert [row[0] for row in expected] != list(range(1, len(expected) + 1))
+
+    db = shards.sessionmakers[0]()
+    try:
+        assert sorted(db.query(Category.id, Category.name, Category.type)) == expected
+
+        # Шард, заполненный до копирования в другом порядке, приводится к основной БД
+        db.query(Category).delete()
+        db.add(Category(name="Только в шарде", type="income"))
+        db.commit()
+        _add_categories(db)
+        copy_categories(main_db, db)
+        assert sorted(db.query(Category.id, Category.name, Category.type)) == expected
+
+        # Транзакции расходящейся категории не теряют ее молча
+        stray = Category(name="Только в шарде", type="income")
+        db.add(stray)
+        db.flush()
+        db.add(Transaction(amount=1, category_id=stray.id, user_id=USER_IDS[0]))
+        db.commit()
+        with pytest.raises(RuntimeError):
+            copy_categories(main_db, db)
+    finally:
+        db.close()
@@ -0,0 +1,48 @@
+"""
+Тесты работы с SQLite в режиме WAL.
+
+Тесты:
+- test_sqlite_engine_pragmas: Соединения к файлу SQLite получают настройки из SQLITE_PRAGMAS.
+- test_migrations_match_models_on_sqlite: Миграции применяются к новой SQLite и совпадают с моделями.
+"""
+
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from app.config import settings
+from app.database import make_engine
+
+ALEMBIC_DIR = Path(__file__).resolve().parent.parent / "alembic"
+
+
+def test_sqlite_engine_pragmas(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/finance.db")
+    try:
+        with engine.connect() as conn:
+            pragma = lambda name: conn.execute(text(f"PRAGMA {name}")).scalar()
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1
+            assert pragma("foreign_keys") == 1
+            assert pragma("busy_timeout") == 5000
+    finally:
+        engine.dispose()
+
+
+def test_migrations_match_models_on_sqlite(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path}/migrated.db"
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+
+    command.upgrade(config, "head")
+    command.check(config)
+
+    engine = make_engine(url)
+    try:
+        tables = set(inspect(engine).get_table_names())
+    finally:
+        engine.dispose()
+    assert {"categories", "transactions", "transactions_archive", "transaction_rollups"} <= tables